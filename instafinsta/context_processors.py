@@ -1,13 +1,15 @@
-from .models import Message
+from django.utils.functional import SimpleLazyObject
+
+from . import unread
 
 def global_unread_count(request):
-    if request.user.is_authenticated:
-        return {
-            "global_unread_count": Message.objects.filter(
-                receiver=request.user, is_read=False
-            ).count()
-        }
-    return {}
+    # Lazy: pages that never show the badge never touch the cache or DB
+    def count():
+        if request.user.is_authenticated:
+            return unread.get_count(request.user.id)
+        return 0
+
+    return {"global_unread_count": SimpleLazyObject(count)}
 
 def custom_context(request):
     return {
@@ -0,0 +1,91 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import realtime, unread
+from .models import Conversation, Message
+
+INBOX_PAGE_SIZE = 30
+INBOX_ORDERING = ("-last_message_at", "-id")
+THREAD_PAGE_SIZE = 50
+THREAD_ORDERING = ("-timestamp", "-id")
+
+
+def _pair(user_id, other_id):
+    return (user_id, other_id) if user_id <= other_id else (other_id, user_id)
+
+
+def _unread_field(conversation_a_id, reader_id):
+    return "unread_a" if reader_id == conversation_a_id else "unread_b"
+
+
+def record_message(message):
+    """Fold a freshly sent message into its conversation summary and push it."""
+    _update_summary(message)
+    unread.adjust(message.receiver_id, 1)
+    realtime.publish_message(message, unread.get_count(message.receiver_id))
+
+
+def _update_summary(message):
+    a, b = _pair(message.sender_id, message.receiver_id)
+    unread = _unread_field(a, message.receiver_id)
+    updates = {
+        "last_message": message,
+        "last_message_at": message.timestamp,
+        unread: F(unread) + 1,
+    }
+    if Conversation.objects.filter(user_a_id=a, user_b_id=b).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            Conversation.objects.create(
+                user_a_id=a, user_b_id=b,
+                last_message=message, last_message_at=message.timestamp,
+                **{unread: 1},
+            )
+    except IntegrityError:
+        # Someone else created the row first; apply our update to theirs
+        Conversation.objects.filter(user_a_id=a, user_b_id=b).update(**updates)
+
+
+def mark_read(reader, other):
+    """Mark everything ``other`` sent to ``reader`` as read."""
+    marked = Message.objects.filter(sender=other, receiver=reader, is_read=False).update(is_read=True)
+    if not marked:
+        return
+    a, b = _pair(reader.id, other.id)
+    Conversation.objects.filter(user_a_id=a, user_b_id=b).update(**{_unread_field(a, reader.id): 0})
+    unread.adjust(reader.id, -marked)
+    realtime.publish_unread(reader.id, unread.get_count(reader.id))
+
+
+def thread(user, other):
+    """Messages between two users, as one queryset per direction.
+
+    Paginate with ``keyset_page`` on THREAD_ORDERING (newest first): each
+    direction is a range of message_pair_time_idx, whereas an OR of the two
+    would make the database sort the pair's whole history for every page.
+    """
+    messages = Message.objects.select_related("sender")
+    if user.id == other.id:
+        return (messages.filter(sender=user, receiver=user),)
+    return (messages.filter(sender=user, receiver=other), messages.filter(sender=other, receiver=user))
+
+
+def inbox(user):
+    """Conversations of ``user`` (most recently active first), one queryset per side.
+
+    Paginate with ``keyset_page`` on INBOX_ORDERING; each side walks its own
+    conversation_*_recent_idx.
+    """
+    conversations = Conversation.objects.select_related("user_a", "user_b")
+    return (conversations.filter(user_a=user), conversations.filter(user_b=user).exclude(user_a=user))
+
+
+def contacts(user, conversations):
+    """The other participant of each conversation, with ``unread_count`` set."""
+    users = []
+    for conversation in conversations:
+        other = conversation.other_user(user)
+        other.unread_count = conversation.unread_for(user)
+        users.append(other)
+    return users
@@ -0,0 +1,200 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, PositiveIntegerField, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Post, PostCounterShard, Profile
+
+PostLike = Post.likes.through
+FollowEdge = Profile.followers.through
+
+SHARD_COUNT = getattr(settings, "COUNTER_SHARDS", 16)
+# like_count + comment_count at which a post's writes move to shards
+SHARD_THRESHOLD = getattr(settings, "COUNTER_SHARD_THRESHOLD", 1000)
+SHARDED_FIELDS = ("like_count", "comment_count")
+
+
+def _deltas(**deltas):
+    # Greatest() keeps a drifted counter from going negative (and tripping
+    # the PositiveIntegerField check) when a decrement races a reconcile.
+    return {field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items() if delta}
+
+
+def incr_post(post_id, **deltas):
+    """Atomically add ``deltas`` (e.g. ``like_count=1``) to one post's counters."""
+    updates = _deltas(**deltas)
+    if updates:
+        Post.objects.filter(id=post_id).update(**updates)
+
+
+def bump_post(post, **deltas):
+    """``incr_post`` for views: spreads the write over shards once ``post`` is hot.
+
+    ``post`` needs its loaded ``counter_shards`` and counter columns.
+    """
+    if not post.counter_shards:
+        incr_post(post.id, **deltas)
+        if post.like_count + post.comment_count + sum(deltas.values()) >= SHARD_THRESHOLD:
+            enable_shards(post.id)
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+    shard = PostCounterShard.objects.filter(post_id=post.id, shard=random.randrange(SHARD_COUNT))
+    if not shard.update(**updates):
+        _create_shards(post.id)
+        shard.update(**updates)
+
+
+def enable_shards(post_id):
+    _create_shards(post_id)
+    Post.objects.filter(id=post_id).update(counter_shards=True)
+
+
+def _create_shards(post_id):
+    PostCounterShard.objects.bulk_create(
+        [PostCounterShard(post_id=post_id, shard=i) for i in range(SHARD_COUNT)], ignore_conflicts=True,
+    )
+
+
+def with_shards(posts):
+    """Add not-yet-rolled-up shard totals onto the counters of ``posts`` in memory.
+
+    One query for the whole list, and none unless some post is sharded.
+    """
+    sharded = {post.id: post for post in posts if post.counter_shards}
+    if sharded:
+        totals = (
+            PostCounterShard.objects.filter(post_id__in=sharded)
+            .values("post_id")
+            .annotate(**{f"pending_{field}": Sum(field) for field in SHARDED_FIELDS})
+        )
+        for row in totals:
+            post = sharded[row["post_id"]]
+            for field in SHARDED_FIELDS:
+                setattr(post, field, max(getattr(post, field) + row[f"pending_{field}"], 0))
+    return posts
+
+
+def rollup(post_id):
+    """Fold a post's shard values into its own counter columns."""
+    with transaction.atomic():
+        shards = list(
+            PostCounterShard.objects.select_for_update().filter(post_id=post_id)
+            .exclude(like_count=0, comment_count=0)
+            .values_list("id", *SHARDED_FIELDS)
+        )
+        totals = dict.fromkeys(SHARDED_FIELDS, 0)
+        for shard_id, *values in shards:
+            # subtract what we read rather than zeroing, so concurrent increments survive
+            PostCounterShard.objects.filter(id=shard_id).update(
+                **{field: F(field) - value for field, value in zip(SHARDED_FIELDS, values)}
+            )
+            for field, value in zip(SHARDED_FIELDS, values):
+                totals[field] += value
+        incr_post(post_id, **totals)
+    return totals
+
+
+def rollup_all():
+    """Roll up every sharded post; returns how many had pending values."""
+    post_ids = PostCounterShard.objects.exclude(like_count=0, comment_count=0).values_list("post_id", flat=True)
+    return sum(1 for post_id in set(post_ids) if any(rollup(post_id).values()))
+
+
+def incr_profile(profile_id, **deltas):
+    updates = _deltas(**deltas)
+    if updates:
+        Profile.objects.filter(id=profile_id).update(**updates)
+
+
+def incr_profiles(profile_ids, **deltas):
+    updates = _deltas(**deltas)
+    if updates and profile_ids:
+        Profile.objects.filter(id__in=profile_ids).update(**updates)
+
+
+def incr_follow(follower_id, target_ids, delta):
+    """Counter side of (un)following ``target_ids``: one UPDATE for all rows.
+
+    Each target's followers_count moves by ``delta`` and the follower's
+    following_count by ``delta * len(target_ids)``.
+    """
+    target_ids = list(target_ids)
+    if not target_ids or not delta:
+        return
+    Profile.objects.filter(id__in=[follower_id, *target_ids]).update(
+        followers_count=Case(
+            When(id__in=target_ids, then=Greatest(F("followers_count") + delta, Value(0))),
+            default=F("followers_count"),
+            output_field=PositiveIntegerField(),
+        ),
+        following_count=Case(
+            When(id=follower_id, then=Greatest(F("following_count") + delta * len(target_ids), Value(0))),
+            default=F("following_count"),
+            output_field=PositiveIntegerField(),
+        ),
+    )
+
+
+# ---------------------------
+# Reconciliation
+# ---------------------------
+def _count_of(queryset, key):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{key: OuterRef("pk")})
+            .order_by()
+            .values(key)
+            .annotate(total=Count("*"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def actual_post_counts():
+    return {
+        "like_count": _count_of(PostLike.objects.all(), "post_id"),
+        "comment_count": _count_of(Comment.objects.all(), "post_id"),
+    }
+
+
+def actual_profile_counts():
+    # followers of P are edges whose from_profile is P; P follows to_profile's owner
+    return {
+        "followers_count": _count_of(FollowEdge.objects.all(), "from_profile_id"),
+        "following_count": _count_of(FollowEdge.objects.all(), "to_profile_id"),
+    }
+
+
+def reconcile(model, actual, batch_size=1000):
+    """Rewrite drifted counters of ``model`` in primary-key batches.
+
+    ``actual`` maps counter field -> expression computing the true value.
+    Returns the primary keys of the rows that were repaired.
+    """
+    repaired = []
+    last_pk = 0
+    while True:
+        batch = list(
+            model.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not batch:
+            return repaired
+        last_pk = batch[-1]
+
+        rows = model.objects.filter(pk__in=batch).annotate(
+            **{f"actual_{field}": expr for field, expr in actual.items()}
+        ).values("pk", *actual, *(f"actual_{field}" for field in actual))
+        for row in rows:
+            fixed = {
+                field: row[f"actual_{field}"]
+                for field in actual
+                if row[field] != row[f"actual_{field}"]
+            }
+            if fixed:
+                model.objects.filter(pk=row["pk"]).update(**fixed)
+                repaired.append(row["pk"])
@@ -0,0 +1,95 @@
+import math
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Post
+from .pagination import decode_cursor, encode_cursor
+
+POOL_SIZE = getattr(settings, "EXPLORE_POOL_SIZE", 1000)
+POOL_TTL = getattr(settings, "EXPLORE_POOL_TTL", 300)
+POPULAR_WINDOW = timedelta(days=getattr(settings, "EXPLORE_POPULAR_DAYS", 30))
+
+CURRENT_KEY = "explore:pool:current"
+POOL_KEY = "explore:pool:{}"
+
+
+def build_pool():
+    """Recent posts plus the most engaging posts of the last few weeks, by id."""
+    ready = Post.objects.filter(status=Post.READY)
+    recent = ready.order_by("-created_at", "-id").values_list("id", flat=True)[:POOL_SIZE // 2]
+    popular = (
+        ready.filter(created_at__gte=timezone.now() - POPULAR_WINDOW)
+        .order_by((F("like_count") + F("comment_count")).desc(), "-id")
+        .values_list("id", flat=True)[:POOL_SIZE // 2]
+    )
+    return list(dict.fromkeys([*recent, *popular]))
+
+
+def refresh_pool():
+    """Build a new pool snapshot and make it current. Returns its version."""
+    version = time.time_ns()
+    # Keep old snapshots around a little longer so open cursors stay valid
+    cache.set(POOL_KEY.format(version), build_pool(), POOL_TTL * 2)
+    cache.set(CURRENT_KEY, version, POOL_TTL)
+    return version
+
+
+def get_pool(version=None):
+    """Return ``(version, ids)``, preferring the snapshot a cursor points at."""
+    if version is not None:
+        ids = cache.get(POOL_KEY.format(version))
+        if ids is not None:
+            return version, ids
+
+    version = cache.get(CURRENT_KEY)
+    ids = cache.get(POOL_KEY.format(version)) if version is not None else None
+    if ids is None:
+        version = refresh_pool()
+        ids = cache.get(POOL_KEY.format(version), [])
+    return version, ids
+
+
+def _permutation(n, seed):
+    """An affine permutation i -> (offset + step * i) mod n of range(n).
+
+    Any i-th element is computed directly, so a page costs O(page) no
+    matter how large the pool is.
+    """
+    rng = random.Random(seed)
+    step = rng.randrange(1, n) if n > 1 else 1
+    while math.gcd(step, n) != 1:
+        step = rng.randrange(1, n)
+    offset = rng.randrange(n)
+    return lambda i: (offset + step * i) % n
+
+
+def sample_page(user, cursor=None, page_size=24):
+    """Return ``(posts, next_cursor)`` for one page of ``user``'s explore grid.
+
+    The order is a per-user shuffle of the pool, seeded by user and pool
+    version so following the cursor never repeats or skips a post.
+    Raises ValueError for a malformed cursor.
+    """
+    version, page = decode_cursor(cursor, ("version", "page")) if cursor else (None, 0)
+    if not isinstance(page, int) or page < 0:
+        raise ValueError("Invalid cursor")
+
+    version, ids = get_pool(version)
+    start = page * page_size
+    stop = min(start + page_size, len(ids))
+    if start >= stop:
+        return [], None
+
+    position = _permutation(len(ids), f"{user.id}:{version}")
+    page_ids = [ids[position(i)] for i in range(start, stop)]
+
+    by_id = Post.objects.select_related("user__profile").exclude(user=user).in_bulk(page_ids)
+    posts = [by_id[post_id] for post_id in page_ids if post_id in by_id]
+    next_cursor = encode_cursor([version, page + 1]) if stop < len(ids) else None
+    return posts, next_cursor
@@ -0,0 +1,112 @@
+import time
+from collections import defaultdict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from . import counters
+from .models import Comment, Post
+
+PREVIEW_COMMENTS = 2
+COMMENT_PAGE_SIZE = 20
+COMMENT_ORDERING = ("created_at", "id")
+
+
+def post_comments(post_id):
+    """A post's comments with their authors; paginate with COMMENT_ORDERING."""
+    return Comment.objects.filter(post_id=post_id).select_related("user__profile")
+
+
+def _version_key(post_id):
+    return f"post_card_version:{post_id}"
+
+
+def card_versions(post_ids):
+    """``{post_id: version}`` for the post card fragment cache, one cache round-trip.
+
+    A missing version (never set, or evicted) gets a fresh one, so an old
+    fragment can never be picked up again.
+    """
+    keys = {_version_key(post_id): post_id for post_id in post_ids}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump_card_version(post_id):
+    """Invalidate the cached card of ``post_id`` after its likes/comments change."""
+    cache.set(_version_key(post_id), time.time_ns(), None)
+
+
+def card_cache_is_shared():
+    """Whether a bump made in this process reaches the web workers' cached cards."""
+    # the default LocMemCache lives in each process's own memory
+    return not isinstance(caches["default"], LocMemCache)
+
+
+class FeedAssembler:
+    """Decorate a page of posts with everything a post card renders.
+
+    Templates used to reach through ``post.likes``/``post.comments`` per
+    post, costing several queries each. ``assemble`` instead issues a fixed
+    number of batched queries for the whole page and attaches:
+
+    * ``viewer_has_liked``
+    * ``preview_comments`` -- the first ``comment_limit`` comments, with
+      their authors (all comments when ``comment_limit`` is None)
+    * ``card_version`` -- key of the cached, viewer-independent card markup
+
+    Posts should come from ``with_authors`` so that ``post.user.profile`` is
+    already loaded. Like and comment totals are the stored counters on
+    ``Post`` and need no query at all.
+    """
+
+    def __init__(self, viewer, comment_limit=PREVIEW_COMMENTS):
+        self.viewer = viewer
+        self.comment_limit = comment_limit
+
+    @staticmethod
+    def with_authors(queryset):
+        return queryset.select_related("user__profile")
+
+    def assemble(self, posts):
+        posts = list(posts)
+        ids = [post.id for post in posts]
+        if not ids:
+            return posts
+
+        counters.with_shards(posts)
+        liked = Post.objects.liked_ids(self.viewer, ids)
+        comments = self._preview_comments(ids)
+        versions = card_versions(ids)
+
+        for post in posts:
+            post.viewer_has_liked = post.id in liked
+            post.preview_comments = comments.get(post.id, [])
+            post.card_version = versions[post.id]
+        return posts
+
+    def _preview_comments(self, ids):
+        if self.comment_limit == 0:
+            return {}
+
+        comments = Comment.objects.filter(post_id__in=ids).select_related("user")
+        if self.comment_limit is not None:
+            # top-N per post in one query instead of one slice per post
+            comments = comments.annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F("post_id"),
+                    order_by=[F("created_at").asc(), F("id").asc()],
+                )
+            ).filter(position__lte=self.comment_limit)
+
+        grouped = defaultdict(list)
+        for comment in comments.order_by("post_id", "created_at", "id"):
+            grouped[comment.post_id].append(comment)
+        return grouped
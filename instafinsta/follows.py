@@ -0,0 +1,89 @@
+"""Follow graph writes.
+
+An edge of ``Profile.followers`` is one row in its join table, so
+following is a single INSERT and unfollowing a single DELETE. Counters
+and timelines are updated only when a row actually changed.
+"""
+from django.db import IntegrityError, transaction
+
+from . import counters, timeline
+from .models import Profile
+
+FollowEdge = Profile.followers.through
+BULK_LIMIT = 100
+
+
+def _edge(follower_id, target_id):
+    # a row of target.followers: from = the followed profile, to = the follower
+    return {"from_profile_id": target_id, "to_profile_id": follower_id}
+
+
+def is_following(follower, target):
+    return FollowEdge.objects.filter(**_edge(follower.id, target.id)).exists()
+
+
+def follow(follower, target):
+    """Make ``follower`` follow ``target``; returns False if it already did."""
+    if follower.id == target.id:
+        return False
+    try:
+        with transaction.atomic():
+            FollowEdge.objects.create(**_edge(follower.id, target.id))
+    except IntegrityError:
+        return False
+    counters.incr_follow(follower.id, [target.id], 1)
+    timeline.add_followees_posts(follower.user, [target.user_id])
+    return True
+
+
+def unfollow(follower, target):
+    """Remove the edge; returns False if ``follower`` wasn't following."""
+    deleted, _ = FollowEdge.objects.filter(**_edge(follower.id, target.id)).delete()
+    if not deleted:
+        return False
+    counters.incr_follow(follower.id, [target.id], -1)
+    timeline.remove_followees_posts(follower.user, [target.user_id])
+    return True
+
+
+def bulk_follow(follower, targets):
+    """Follow every profile in ``targets``; returns the ones newly followed."""
+    targets = {t.id: t for t in targets if t.id != follower.id}
+    existing = set(
+        FollowEdge.objects.filter(to_profile_id=follower.id, from_profile_id__in=targets)
+        .values_list("from_profile_id", flat=True)
+    )
+    new = [target for target_id, target in targets.items() if target_id not in existing]
+    if not new:
+        return []
+    with transaction.atomic():
+        FollowEdge.objects.bulk_create(
+            [FollowEdge(**_edge(follower.id, target.id)) for target in new], ignore_conflicts=True,
+        )
+        counters.incr_follow(follower.id, [target.id for target in new], 1)
+    timeline.add_followees_posts(follower.user, [target.user_id for target in new])
+    return new
+
+
+def bulk_unfollow(follower, targets):
+    """Unfollow every profile in ``targets``; returns the ones actually unfollowed."""
+    targets = {t.id: t for t in targets}
+    edges = FollowEdge.objects.filter(to_profile_id=follower.id, from_profile_id__in=targets)
+    with transaction.atomic():
+        removed = [targets[target_id] for target_id in edges.values_list("from_profile_id", flat=True)]
+        if not removed:
+            return []
+        edges.delete()
+        counters.incr_follow(follower.id, [target.id for target in removed], -1)
+    timeline.remove_followees_posts(follower.user, [target.user_id for target in removed])
+    return removed
+
+
+def counts(*profiles):
+    """Fresh ``{profile_id: (followers_count, following_count)}`` -- a PK lookup, no COUNT."""
+    return {
+        profile_id: (followers, following)
+        for profile_id, followers, following in Profile.objects.filter(
+            id__in=[profile.id for profile in profiles]
+        ).values_list("id", "followers_count", "following_count")
+    }
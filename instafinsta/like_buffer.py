@@ -0,0 +1,164 @@
+"""Coalesced like writes for hot posts (``settings.LIKE_BUFFERING``).
+
+Instead of one INSERT/DELETE plus a counter UPDATE per click, like and
+unlike events are folded into a per-process buffer -- only the last state
+of each (post, user) pair survives -- and flushed every
+``LIKE_FLUSH_INTERVAL`` seconds as one ``bulk_create``, one DELETE per
+post and one counter UPDATE per post. Responses carry the stored count
+plus the not-yet-flushed delta. A flush that fails puts its events back,
+so the next one retries them.
+
+Each process buffers on its own, so a user whose clicks land on different
+workers within one interval can leave a counter off by one;
+``reconcile_counters`` repairs that.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import counters
+from .feed import bump_card_version
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+PostLike = Post.likes.through
+
+
+def enabled():
+    return getattr(settings, "LIKE_BUFFERING", False)
+
+
+class LikeBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._states = {}  # (post_id, user_id) -> [liked in the DB, liked now]
+        self._deltas = defaultdict(int)  # post_id -> pending like_count change
+        self._flushing = {}  # states being written by the running flush
+        self._flusher = None
+
+    def state(self, post_id, user_id):
+        """Buffered like state of the pair, or None if nothing is pending."""
+        with self._lock:
+            # a flush in progress hasn't committed yet, so the DB still shows the old state
+            entry = self._states.get((post_id, user_id)) or self._flushing.get((post_id, user_id))
+            return None if entry is None else entry[1]
+
+    def record(self, post_id, user_id, liked, stored):
+        """Buffer "``user_id`` now does (not) like ``post_id``".
+
+        ``stored`` is whether the like exists in the database, used the
+        first time the pair is seen in this interval. Returns the post's
+        pending like_count delta.
+        """
+        with self._lock:
+            entry = self._states.setdefault((post_id, user_id), [stored, stored])
+            if entry[1] != liked:
+                self._deltas[post_id] += 1 if liked else -1
+                entry[1] = liked
+            delta = self._deltas[post_id]
+        self._ensure_flusher()
+        return delta
+
+    def pending_delta(self, post_id):
+        with self._lock:
+            return self._deltas.get(post_id, 0)
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of posts touched."""
+        with self._flush_lock:
+            with self._lock:
+                states, self._states = self._states, {}
+                deltas, self._deltas = self._deltas, defaultdict(int)
+                self._flushing = states
+            try:
+                return self._write(states, deltas)
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def _write(self, states, deltas):
+        adds = [PostLike(post_id=p, user_id=u) for (p, u), (was, now) in states.items() if now and not was]
+        removes = defaultdict(list)
+        for (post_id, user_id), (was, now) in states.items():
+            if was and not now:
+                removes[post_id].append(user_id)
+        changed = [post_id for post_id, delta in deltas.items() if delta]
+
+        try:
+            with transaction.atomic():
+                PostLike.objects.bulk_create(adds, ignore_conflicts=True, batch_size=1000)
+                for post_id, user_ids in removes.items():
+                    PostLike.objects.filter(post_id=post_id, user_id__in=user_ids).delete()
+                for post_id in changed:
+                    counters.incr_post(post_id, like_count=deltas[post_id])
+        except Exception:
+            # e.g. "database is locked": keep the events for the next flush
+            self._restore(states)
+            raise
+        for post_id in changed:
+            bump_card_version(post_id)
+        return len(changed)
+
+    def _restore(self, states):
+        """Merge the states of a failed flush back under anything recorded since."""
+        with self._lock:
+            for key, (was, now) in states.items():
+                newer = self._states.get(key)
+                # the database still holds ``was``; the latest click wins
+                self._states[key] = [was, now if newer is None else newer[1]]
+            self._deltas = defaultdict(int)
+            for (post_id, _), (was, now) in self._states.items():
+                if was != now:
+                    self._deltas[post_id] += 1 if now else -1
+
+    def _ensure_flusher(self):
+        # 0 disables the background thread; the caller flushes by hand (tests)
+        interval = getattr(settings, "LIKE_FLUSH_INTERVAL", 1.0)
+        if self._flusher is not None or not interval:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._run, args=(interval,), name="like-flusher", daemon=True,
+                )
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing buffered likes failed")
+            finally:
+                close_old_connections()
+
+
+_buffer = LikeBuffer()
+
+
+def get_buffer():
+    return _buffer
+
+
+def record(post, user_id, action=None):
+    """Buffered counterpart of toggle_like; returns ``(liked, optimistic_count)``.
+
+    ``action`` is "like", "unlike" or None to toggle, as in the view.
+    """
+    buffer = get_buffer()
+    current = buffer.state(post.id, user_id)
+    if current is None:
+        current = PostLike.objects.filter(post_id=post.id, user_id=user_id).exists()
+    liked = {"like": True, "unlike": False}.get(action, not current)
+    delta = buffer.record(post.id, user_id, liked, current)
+    counters.with_shards([post])
+    return liked, max(post.like_count + delta, 0)
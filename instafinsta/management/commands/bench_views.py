@@ -0,0 +1,113 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from instafinsta.models import Conversation, Profile
+
+VIEWS = ("feed", "explore", "inbox", "message_thread", "profile", "profile_list")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the main views through the test client and print p50/p95 latency and query "
+        "counts as JSON (seed data first with seed_social_graph)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20, help="Requests per view.")
+        parser.add_argument("--viewers", type=int, default=5, help="Distinct logged-in users to rotate through.")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per view first.")
+        parser.add_argument("--cold", action="store_true", help="Clear the cache before every request.")
+        parser.add_argument("--views", nargs="*", choices=VIEWS, default=VIEWS)
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        # viewers with conversations, so every view has something to render
+        viewers = list(
+            User.objects.filter(
+                id__in=Conversation.objects.values("user_a_id")
+            ).order_by("id")[:options["viewers"]]
+        ) or list(User.objects.order_by("id")[:options["viewers"]])
+        if not viewers:
+            raise CommandError("No users to benchmark with; run seed_social_graph first.")
+        popular = Profile.objects.select_related("user").order_by("-followers_count").first()
+
+        report = {
+            "iterations": options["iterations"],
+            "viewers": len(viewers),
+            "cold_cache": options["cold"],
+            "views": {},
+        }
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            clients = []
+            for viewer in viewers:
+                client = Client()
+                client.force_login(viewer)
+                clients.append((viewer, client))
+            for name in options["views"]:
+                report["views"][name] = self.bench(name, clients, popular, options)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def url_for(self, name, viewer, popular):
+        if name == "message_thread":
+            conversation = Conversation.objects.filter(Q(user_a=viewer) | Q(user_b=viewer)).first()
+            if conversation is None:
+                other_id = viewer.id
+            elif conversation.user_a_id == viewer.id:
+                other_id = conversation.user_b_id
+            else:
+                other_id = conversation.user_a_id
+            return reverse("message_thread", args=[other_id])
+        if name == "profile":
+            return reverse("view_profile", args=[popular.user.username if popular else viewer.username])
+        if name == "profile_list":
+            return reverse("profile-list")
+        return reverse(name)
+
+    def bench(self, name, clients, popular, options):
+        urls = [(client, self.url_for(name, viewer, popular)) for viewer, client in clients]
+        for i in range(options["warmup"]):
+            client, url = urls[i % len(urls)]
+            client.get(url)
+
+        timings, queries, statuses = [], [], set()
+        for i in range(options["iterations"]):
+            client, url = urls[i % len(urls)]
+            if options["cold"]:
+                cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(ctx))
+            statuses.add(response.status_code)
+
+        return {
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "queries_p50": percentile(queries, 50),
+            "queries_max": max(queries),
+            "statuses": sorted(statuses),
+        }
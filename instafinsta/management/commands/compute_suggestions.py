@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from instafinsta import suggestions
+
+
+class Command(BaseCommand):
+    help = "Recompute follow suggestions for every profile from the follow graph (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=suggestions.TOP_K)
+        parser.add_argument("--chunk-size", type=int, default=suggestions.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        written = suggestions.compute(top_k=options["top_k"], chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Stored suggestions for {written} profile(s)."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from instafinsta import uploads
+from instafinsta.feed import card_cache_is_shared
+
+
+class Command(BaseCommand):
+    help = "Push staged images to media storage (for deployments with UPLOAD_WORKER_THREADS = 0)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None)
+
+    def handle(self, *args, **options):
+        # each finished or failed post image bumps its card version (see uploads._apply)
+        done = uploads.process_pending(limit=options["limit"])
+        if done and not card_cache_is_shared():
+            self.stderr.write(self.style.WARNING(
+                "The cache is per-process (REDIS_URL is not set), so web workers keep serving "
+                "their cached post cards until the fragments expire."
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Uploaded {done} staged file(s)."))
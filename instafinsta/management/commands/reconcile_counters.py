@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from instafinsta import counters
+from instafinsta.feed import bump_card_version, card_cache_is_shared
+from instafinsta.models import Post, Profile
+
+
+class Command(BaseCommand):
+    help = "Repair drift in the stored like/comment/follower counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # fold shards in first, or their deltas would be counted twice
+        counters.rollup_all()
+        posts = counters.reconcile(Post, counters.actual_post_counts(), batch_size)
+        profiles = counters.reconcile(Profile, counters.actual_profile_counts(), batch_size)
+        # cached post cards still show the drifted counts
+        for post_id in posts:
+            bump_card_version(post_id)
+        if posts and not card_cache_is_shared():
+            self.stderr.write(self.style.WARNING(
+                "The cache is per-process (REDIS_URL is not set), so web workers keep serving "
+                "their cached post cards until the fragments expire."
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired counters on {len(posts)} post(s) and {len(profiles)} profile(s)."
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from instafinsta import explore_pool
+
+
+class Command(BaseCommand):
+    help = "Rebuild the explore candidate pool (run periodically, e.g. from cron)."
+
+    def handle(self, *args, **options):
+        version = explore_pool.refresh_pool()
+        _, ids = explore_pool.get_pool(version)
+        self.stdout.write(self.style.SUCCESS(f"Explore pool {version}: {len(ids)} post(s)."))
@@ -0,0 +1,323 @@
+import asyncio
+import http.client
+import io
+import json
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import Resolver404, resolve
+from django.utils.crypto import get_random_string
+
+from .bench_views import percentile
+
+DEFAULT_EXCLUDE = r"^/messages/stream/"  # SSE streams never finish on their own
+
+
+def load_log(path, limit=None):
+    """Entries of a JSONL access log, in file order.
+
+    Each line is an object with ``path`` and optionally ``method`` (GET),
+    ``user`` (username to act as), ``body`` (dict sent as a form, or a
+    string sent as is), ``content_type`` and ``ts`` (epoch seconds or an
+    ISO 8601 time, used for pacing).
+    """
+    entries = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                raise CommandError(f"{path}:{number}: not valid JSON")
+            if not isinstance(entry, dict) or "path" not in entry:
+                raise CommandError(f"{path}:{number}: expected an object with a \"path\"")
+            entries.append(entry)
+            if limit and len(entries) == limit:
+                break
+    return entries
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def endpoint(path):
+    try:
+        return resolve(urlsplit(path).path).view_name
+    except Resolver404:
+        return "unmatched"
+
+
+class Prepared:
+    """One log entry turned into method, path, query, headers and body bytes."""
+
+    def __init__(self, entry, cookies):
+        url = urlsplit(entry["path"])
+        self.method = entry.get("method", "GET").upper()
+        self.path = url.path
+        self.query = url.query
+        self.endpoint = endpoint(entry["path"])
+        body = entry.get("body")
+        content_type = entry.get("content_type")
+        if isinstance(body, dict):
+            if content_type == "application/json":
+                body = json.dumps(body)
+            else:
+                body, content_type = urlencode(body, doseq=True), "application/x-www-form-urlencoded"
+        self.body = (body or "").encode()
+        self.headers = {"Cookie": cookies.get(entry.get("user"), "")}
+        if content_type:
+            self.headers["Content-Type"] = content_type
+        if "csrftoken" in self.headers["Cookie"]:
+            self.headers["X-CSRFToken"] = SimpleCookie(self.headers["Cookie"])["csrftoken"].value
+
+
+class WSGITarget:
+    def __init__(self, host):
+        from network.wsgi import application
+
+        self.application = application
+        self.host = host
+
+    def send(self, request):
+        environ = {
+            "REQUEST_METHOD": request.method,
+            "PATH_INFO": request.path,
+            "QUERY_STRING": request.query,
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": self.host,
+            "CONTENT_LENGTH": str(len(request.body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(request.body),
+            "wsgi.errors": io.StringIO(),
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in request.headers.items():
+            key = name.upper().replace("-", "_")
+            environ[key if key == "CONTENT_TYPE" else f"HTTP_{key}"] = value
+
+        status = []
+        result = self.application(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return int(status[0].split()[0])
+
+
+class ASGITarget:
+    def __init__(self, host):
+        from network.asgi import application
+
+        self.application = application
+        self.host = host
+
+    async def send(self, request):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "scheme": "http",
+            "path": request.path,
+            "raw_path": request.path.encode(),
+            "query_string": request.query.encode(),
+            "headers": [(b"host", self.host.encode())] + [
+                (name.lower().encode(), value.encode()) for name, value in request.headers.items()
+            ],
+            "server": (self.host, 80),
+            "client": ("127.0.0.1", 0),
+        }
+        body_sent = False
+        done = asyncio.Event()
+        status = []
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": request.body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                done.set()
+
+        await self.application(scope, receive, send)
+        return status[0]
+
+
+class HTTPTarget:
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        if parts.scheme != "http":
+            raise CommandError("Only plain http:// URLs are supported (replay runs against a local server)")
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+
+    def send(self, request):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            path = f"{request.path}?{request.query}" if request.query else request.path
+            conn.request(request.method, path, body=request.body or None, headers=request.headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a JSONL access log against the WSGI or ASGI app in-process, or a local "
+        "server URL, and report per-endpoint throughput and latency percentiles as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("log", help="JSONL file of {ts, method, path, user, body} entries.")
+        parser.add_argument("--target", default="wsgi", help="wsgi, asgi, or a URL such as http://localhost:8000")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--speed", type=float, default=0,
+            help="Time scaling of the logged ts gaps: 1 = real time, 10 = ten times faster, 0 = no pacing.",
+        )
+        parser.add_argument("--limit", type=int, help="Replay only the first N entries.")
+        parser.add_argument("--exclude", default=DEFAULT_EXCLUDE, help="Regex of paths to skip.")
+        parser.add_argument("--host", default="localhost", help="Host header for in-process targets.")
+        parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds.")
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1")
+        exclude = re.compile(options["exclude"]) if options["exclude"] else None
+        entries = [
+            entry for entry in load_log(options["log"], options["limit"])
+            if not (exclude and exclude.search(entry["path"]))
+        ]
+        if not entries:
+            raise CommandError("Nothing to replay")
+
+        cookies = self.sessions({entry.get("user") for entry in entries} - {None})
+        requests = [Prepared(entry, cookies) for entry in entries]
+        times = [_timestamp(entry.get("ts")) for entry in entries]
+        offsets = [0.0] * len(entries)
+        if options["speed"] and all(t is not None for t in times):
+            offsets = [(t - times[0]) / options["speed"] for t in times]
+
+        target = options["target"]
+        if target == "wsgi":
+            target = WSGITarget(options["host"])
+        elif target == "asgi":
+            target = ASGITarget(options["host"])
+        else:
+            target = HTTPTarget(target, options["timeout"])
+
+        results, elapsed = asyncio.run(self.replay(target, requests, offsets, options))
+        report = self.report(results, elapsed, options)
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def sessions(self, usernames):
+        """Cookie header per username: a logged-in session plus a CSRF token."""
+        cookies = {None: ""}
+        users = User.objects.in_bulk(usernames, field_name="username")
+        for username in usernames:
+            user = users.get(username)
+            if user is None:
+                self.stderr.write(f"Unknown user {username!r}; replaying those requests anonymously")
+                cookies[username] = ""
+                continue
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            cookies[username] = (
+                f"{settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={get_random_string(32)}"
+            )
+        return cookies
+
+    async def replay(self, target, requests, offsets, options):
+        semaphore = asyncio.Semaphore(options["concurrency"])
+        executor = ThreadPoolExecutor(max_workers=options["concurrency"])
+        loop = asyncio.get_running_loop()
+        results = []
+        start = time.perf_counter()
+
+        async def run(request, offset):
+            delay = offset - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with semaphore:
+                sent = time.perf_counter()
+                try:
+                    if isinstance(target, ASGITarget):
+                        status = await asyncio.wait_for(target.send(request), options["timeout"])
+                    else:
+                        status = await loop.run_in_executor(executor, target.send, request)
+                except asyncio.TimeoutError:
+                    status = "timeout"
+                except Exception as exc:
+                    status = type(exc).__name__
+                results.append((request.endpoint, status, (time.perf_counter() - sent) * 1000))
+
+        try:
+            await asyncio.gather(*(run(request, offset) for request, offset in zip(requests, offsets)))
+        finally:
+            executor.shutdown(wait=True)
+        return results, time.perf_counter() - start
+
+    def report(self, results, elapsed, options):
+        by_endpoint = defaultdict(list)
+        for name, status, latency in results:
+            by_endpoint[name].append((status, latency))
+
+        def summary(rows):
+            latencies = [latency for _, latency in rows]
+            statuses = defaultdict(int)
+            for status, _ in rows:
+                statuses[str(status)] += 1
+            return {
+                "requests": len(rows),
+                "throughput_rps": round(len(rows) / elapsed, 2),
+                "errors": sum(1 for status, _ in rows if not isinstance(status, int) or status >= 500),
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p95_ms": round(percentile(latencies, 95), 2),
+                "p99_ms": round(percentile(latencies, 99), 2),
+                "statuses": dict(sorted(statuses.items())),
+            }
+
+        return {
+            "target": options["target"],
+            "concurrency": options["concurrency"],
+            "speed": options["speed"],
+            "elapsed_s": round(elapsed, 3),
+            "overall": summary([(status, latency) for _, status, latency in results]),
+            "endpoints": {name: summary(rows) for name, rows in sorted(by_endpoint.items())},
+        }
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from instafinsta import counters
+
+
+class Command(BaseCommand):
+    help = "Fold sharded like/comment counters back into Post (run every minute or so)."
+
+    def handle(self, *args, **options):
+        rolled = counters.rollup_all()
+        self.stdout.write(self.style.SUCCESS(f"Rolled up counters of {rolled} post(s)."))
@@ -0,0 +1,186 @@
+import datetime
+from contextlib import contextmanager
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from instafinsta import timeline
+from instafinsta.models import Comment, Conversation, Message, Post, Profile
+
+FollowEdge = Profile.followers.through
+PostLike = Post.likes.through
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the given auto_now_add values instead of "now"."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic social graph for local load testing: users, power-law follow "
+        "edges, posts, likes, comments and message threads, then rebuild derived tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--avg-follows", type=int, default=20)
+        parser.add_argument("--posts-per-user", type=int, default=5)
+        parser.add_argument("--likes-per-post", type=int, default=10, help="Mean; popular authors get more.")
+        parser.add_argument("--comments-per-post", type=int, default=3)
+        parser.add_argument("--threads-per-user", type=int, default=2)
+        parser.add_argument("--messages-per-thread", type=int, default=20)
+        parser.add_argument("--days", type=int, default=30, help="Spread timestamps over this many days.")
+        parser.add_argument("--prefix", default="seed", help="Username prefix (seed_0, seed_1, ...).")
+        parser.add_argument("--password", default="password")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.rng = np.random.default_rng(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+        self.span = datetime.timedelta(days=options["days"]).total_seconds()
+
+        timestamp_fields = [model._meta.get_field(name) for model, name in
+                            ((Post, "created_at"), (Comment, "created_at"), (Message, "timestamp"))]
+        with transaction.atomic(), explicit_timestamps(*timestamp_fields):
+            users = self.create_users(options["users"], options["prefix"], options["password"])
+            profiles = dict(Profile.objects.filter(user__in=users).values_list("user_id", "id"))
+            user_ids = np.array([user.id for user in users])
+            # Zipf-like popularity: a few accounts attract most follows and likes
+            weights = 1.0 / np.arange(1, len(users) + 1) ** 0.8
+            weights /= weights.sum()
+            popularity = self.rng.permutation(weights)
+
+            follows = self.create_follows(user_ids, profiles, popularity, options["avg_follows"])
+            posts = self.create_posts(user_ids, options["posts_per_user"])
+            self.post_times = {post.id: post.created_at for post in posts}
+            likes = self.create_likes(posts, user_ids, popularity, options["likes_per_post"])
+            comments = self.create_comments(posts, user_ids, options["comments_per_post"])
+            messages = self.create_threads(
+                user_ids, options["threads_per_user"], options["messages_per_thread"],
+            )
+
+        # Derived tables are rebuilt the same way as in production
+        call_command("reconcile_counters", stdout=self.stdout)
+        for user in users:
+            timeline.rebuild_timeline(user)
+        call_command("refresh_explore_pool", stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {follows} follows, {len(posts)} posts, {likes} likes, "
+            f"{comments} comments and {messages} messages."
+        ))
+
+    def timestamps(self, count):
+        """``count`` random past datetimes, oldest first."""
+        offsets = np.sort(self.rng.uniform(0, self.span, count))[::-1]
+        return [self.now - datetime.timedelta(seconds=float(s)) for s in offsets]
+
+    def create_users(self, count, prefix, password):
+        start = User.objects.filter(username__startswith=f"{prefix}_").count()
+        hashed = make_password(password)
+        users = User.objects.bulk_create(
+            [User(username=f"{prefix}_{i}", password=hashed) for i in range(start, start + count)],
+            batch_size=self.batch_size,
+        )
+        # bulk_create skips the post_save signal that normally creates profiles
+        Profile.objects.bulk_create(
+            [Profile(user=user, search_name=user.username.lower()) for user in users], batch_size=self.batch_size,
+        )
+        return users
+
+    def create_follows(self, user_ids, profiles, popularity, avg_follows):
+        edges = set()
+        # follow counts are heavy-tailed too, with at least one each
+        counts = np.minimum(self.rng.geometric(1.0 / max(avg_follows, 1), len(user_ids)), len(user_ids) - 1)
+        for follower, count in zip(user_ids, counts):
+            for followee in self.rng.choice(user_ids, size=count, replace=False, p=popularity):
+                if followee != follower:
+                    edges.add((profiles[int(follower)], profiles[int(followee)]))
+        FollowEdge.objects.bulk_create(
+            # a row of target.followers: from = the followed profile, to = the follower
+            [FollowEdge(from_profile_id=followee, to_profile_id=follower) for follower, followee in edges],
+            batch_size=self.batch_size, ignore_conflicts=True,
+        )
+        return len(edges)
+
+    def create_posts(self, user_ids, per_user):
+        authors = np.repeat(user_ids, per_user)
+        self.rng.shuffle(authors)
+        return Post.objects.bulk_create(
+            [
+                Post(user_id=int(author), caption=f"Synthetic post {i}", created_at=created_at)
+                for i, (author, created_at) in enumerate(zip(authors, self.timestamps(len(authors))))
+            ],
+            batch_size=self.batch_size,
+        )
+
+    def create_likes(self, posts, user_ids, popularity, per_post):
+        author_weight = dict(zip(user_ids.tolist(), popularity * len(user_ids)))
+        rows = []
+        for post in posts:
+            count = min(self.rng.poisson(per_post * author_weight[post.user_id]), len(user_ids))
+            rows.extend(
+                PostLike(post_id=post.id, user_id=int(user))
+                for user in self.rng.choice(user_ids, size=count, replace=False)
+            )
+        PostLike.objects.bulk_create(rows, batch_size=self.batch_size, ignore_conflicts=True)
+        return len(rows)
+
+    def create_comments(self, posts, user_ids, per_post):
+        rows = []
+        for post in posts:
+            for user in self.rng.choice(user_ids, size=self.rng.poisson(per_post)):
+                rows.append(Comment(post_id=post.id, user_id=int(user), content="Synthetic comment"))
+        for comment, created_at in zip(rows, self.timestamps(len(rows))):
+            comment.created_at = max(created_at, self.post_times[comment.post_id])
+        Comment.objects.bulk_create(rows, batch_size=self.batch_size)
+        return len(rows)
+
+    def create_threads(self, user_ids, per_user, per_thread):
+        pairs = set()
+        for user in user_ids:
+            for other in self.rng.choice(user_ids, size=min(per_user, len(user_ids) - 1), replace=False):
+                if other != user:
+                    pairs.add(tuple(sorted((int(user), int(other)))))
+        pairs = sorted(pairs)
+
+        rows = []
+        for a, b in pairs:
+            for i in range(per_thread):
+                sender, receiver = (a, b) if self.rng.random() < 0.5 else (b, a)
+                # everything but the last few messages has been read
+                rows.append(Message(sender_id=sender, receiver_id=receiver, content=f"Synthetic message {i}",
+                                    is_read=i < per_thread - 3))
+        for message, timestamp in zip(rows, self.timestamps(len(rows))):
+            message.timestamp = timestamp
+        messages = Message.objects.bulk_create(rows, batch_size=self.batch_size)
+
+        # Conversation summaries straight from what was just generated
+        summaries = {}
+        for message in messages:
+            a, b = sorted((message.sender_id, message.receiver_id))
+            summary = summaries.setdefault((a, b), {"last": message, "unread_a": 0, "unread_b": 0})
+            if message.timestamp >= summary["last"].timestamp:
+                summary["last"] = message
+            if not message.is_read:
+                summary["unread_a" if message.receiver_id == a else "unread_b"] += 1
+        Conversation.objects.bulk_create([
+            Conversation(user_a_id=a, user_b_id=b, last_message=s["last"], last_message_at=s["last"].timestamp,
+                         unread_a=s["unread_a"], unread_b=s["unread_b"])
+            for (a, b), s in summaries.items()
+        ], batch_size=self.batch_size, ignore_conflicts=True)
+        return len(messages)
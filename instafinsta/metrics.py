@@ -0,0 +1,175 @@
+"""Per-view latency, SQL and template timings in Prometheus text format.
+
+Enabled with ``settings.METRICS_ENABLED``. ``MetricsMiddleware`` labels
+every request with its URL name and records histograms of total latency,
+SQL query count and time (through ``connection.execute_wrapper``) and
+template render time. ``render()`` produces the exposition served at
+``/metrics``. Values live in process memory, so each worker reports its
+own series and Prometheus sums them.
+
+Under ASGI the middleware chain is async, and Django runs sync views and
+the ORM's ``sync_to_async`` calls of one request on a single
+thread-sensitive thread. The SQL wrapper is installed on that thread's
+connections, so queries are counted the same way as under WSGI.
+"""
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template import base as template_base
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def enabled():
+    return getattr(settings, "METRICS_ENABLED", False)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # view -> [bucket counts..., sum, count]
+
+    def observe(self, view, value):
+        with self._lock:
+            series = self._series.setdefault(view, [0] * len(self.buckets) + [0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {view: list(values) for view, values in self._series.items()}
+        for view, values in sorted(series.items()):
+            label = f'view="{_escape(view)}"'
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {values[-1]}')
+            lines.append(f"{self.name}_sum{{{label}}} {values[-2]}")
+            lines.append(f"{self.name}_count{{{label}}} {values[-1]}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram(
+    "instafinsta_request_duration_seconds", "Time from request to response, per view.", LATENCY_BUCKETS)
+SQL_QUERIES = Histogram(
+    "instafinsta_request_sql_queries", "SQL statements executed per request, per view.", QUERY_BUCKETS)
+SQL_SECONDS = Histogram(
+    "instafinsta_request_sql_duration_seconds", "Time spent in SQL per request, per view.", LATENCY_BUCKETS)
+TEMPLATE_SECONDS = Histogram(
+    "instafinsta_request_template_duration_seconds", "Template render time per request, per view.", LATENCY_BUCKETS)
+HISTOGRAMS = (REQUEST_SECONDS, SQL_QUERIES, SQL_SECONDS, TEMPLATE_SECONDS)
+
+
+def render():
+    return "\n".join(line for histogram in HISTOGRAMS for line in histogram.expose()) + "\n"
+
+
+class _RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+_current = ContextVar("instafinsta_request_stats", default=None)
+_original_render = template_base.Template.render
+
+
+def _timed_render(self, context):
+    stats = _current.get()
+    # only the outermost template; includes and blocks render inside it
+    if stats is None or context.template is not None:
+        return _original_render(self, context)
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        stats.template_seconds += time.perf_counter() - start
+
+
+def _wrap_connections(stats):
+    """Route the calling thread's queries through ``stats``; close the stack to undo."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+    return stack
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        template_base.Template.render = _timed_render
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = _RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with _wrap_connections(stats):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = _RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        # the request's thread-sensitive thread, where its sync code and queries run
+        stack = await sync_to_async(_wrap_connections)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current.reset(token)
+        self._record(request, time.perf_counter() - start, stats)
+        return response
+
+    @staticmethod
+    def _record(request, elapsed, stats):
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else None) or "unmatched"
+        REQUEST_SECONDS.observe(view, elapsed)
+        TEMPLATE_SECONDS.observe(view, stats.template_seconds)
+        SQL_QUERIES.observe(view, stats.queries)
+        SQL_SECONDS.observe(view, stats.sql_seconds)
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BACKFILL_LIMIT = 200  # timeline.BACKFILL_LIMIT at the time of this migration
+
+
+def populate_timelines(apps, schema_editor):
+    # Same as timeline.rebuild_timeline, on the historical models: the feed
+    # reads only this table, so existing users must not start out empty.
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model("instafinsta", "Post")
+    Profile = apps.get_model("instafinsta", "Profile")
+    TimelineEntry = apps.get_model("instafinsta", "TimelineEntry")
+
+    for user_id in User.objects.order_by("id").values_list("id", flat=True).iterator():
+        followees = Profile.objects.filter(followers__user_id=user_id).values_list("user_id", flat=True)
+        posts = Post.objects.filter(
+            user_id__in=[user_id, *followees]
+        ).order_by("-created_at", "-id").values_list("id", "created_at")[:BACKFILL_LIMIT]
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id, created_at=created_at) for post_id, created_at in posts],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instafinsta', '0036_remove_follow_model'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='instafinsta.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry')],
+            },
+        ),
+        migrations.RunPython(populate_timelines, migrations.RunPython.noop),
+    ]
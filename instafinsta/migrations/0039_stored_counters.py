@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count_of(queryset, key):
+    return Coalesce(Subquery(
+        queryset.filter(**{key: OuterRef("pk")}).order_by().values(key)
+        .annotate(total=Count("*")).values("total")
+    ), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model("instafinsta", "Post")
+    Profile = apps.get_model("instafinsta", "Profile")
+    Comment = apps.get_model("instafinsta", "Comment")
+    PostLike = Post._meta.get_field("likes").remote_field.through
+    FollowEdge = Profile._meta.get_field("followers").remote_field.through
+
+    Post.objects.update(
+        like_count=_count_of(PostLike.objects.all(), "post_id"),
+        comment_count=_count_of(Comment.objects.all(), "post_id"),
+    )
+    Profile.objects.update(
+        followers_count=_count_of(FollowEdge.objects.all(), "from_profile_id"),
+        following_count=_count_of(FollowEdge.objects.all(), "to_profile_id"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instafinsta', '0038_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:49
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Lower
+
+
+def populate_search_name(apps, schema_editor):
+    Profile = apps.get_model("instafinsta", "Profile")
+    User = apps.get_model("auth", "User")
+    Profile.objects.update(search_name=Subquery(
+        User.objects.filter(pk=OuterRef("user_id")).values(name=Lower("username"))[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instafinsta', '0039_stored_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='search_name',
+            field=models.CharField(blank=True, db_index=True, max_length=150),
+        ),
+        migrations.RunPython(populate_search_name, migrations.RunPython.noop),
+    ]
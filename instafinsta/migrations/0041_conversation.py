@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def build_conversations(apps, schema_editor):
+    Message = apps.get_model("instafinsta", "Message")
+    Conversation = apps.get_model("instafinsta", "Conversation")
+
+    summaries = {}
+    rows = Message.objects.values("sender_id", "receiver_id").annotate(
+        last_id=Max("id"), unread=Count("id", filter=Q(is_read=False)),
+    ).order_by()
+    for row in rows:
+        a, b = sorted((row["sender_id"], row["receiver_id"]))
+        summary = summaries.setdefault((a, b), {"last_id": 0, "unread_a": 0, "unread_b": 0})
+        summary["last_id"] = max(summary["last_id"], row["last_id"])
+        summary["unread_a" if row["receiver_id"] == a else "unread_b"] += row["unread"]
+
+    # in_bulk() batches the id list under the backend's parameter limit
+    last_messages = Message.objects.only("timestamp").in_bulk([s["last_id"] for s in summaries.values()])
+    Conversation.objects.bulk_create([
+        Conversation(
+            user_a_id=a, user_b_id=b,
+            last_message_id=s["last_id"], last_message_at=last_messages[s["last_id"]].timestamp,
+            unread_a=s["unread_a"], unread_b=s["unread_b"],
+        )
+        for (a, b), s in summaries.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instafinsta', '0040_profile_search_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField()),
+                ('unread_a', models.PositiveIntegerField(default=0)),
+                ('unread_b', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='instafinsta.message')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_a', '-last_message_at', '-id'], name='conversation_a_recent_idx'), models.Index(fields=['user_b', '-last_message_at', '-id'], name='conversation_b_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user_a', 'user_b'), name='unique_conversation_pair')],
+            },
+        ),
+        migrations.RunPython(build_conversations, migrations.RunPython.noop),
+    ]
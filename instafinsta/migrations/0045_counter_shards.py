@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instafinsta', '0044_upload_pipeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='counter_shards',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PostCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('like_count', models.IntegerField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shard_rows', to='instafinsta.post')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('post', 'shard'), name='unique_post_counter_shard')],
+            },
+        ),
+    ]
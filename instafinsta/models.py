@@ -1,6 +1,6 @@
 import cloudinary
 from cloudinary.models import CloudinaryField
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -25,18 +25,15 @@ class Profile(models.Model):
         related_name="following",
         blank=True
     )
+    # Denormalized counters, kept in step by instafinsta.counters
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Lowercased copy of user.username for indexed prefix search
+    search_name = models.CharField(max_length=150, blank=True, db_index=True)
 
     def __str__(self):
         return self.user.username
 
-    @property
-    def followers_count(self):
-        return self.followers.count()
-
-    @property
-    def following_count(self):
-        return self.following.count()
-
     def is_following(self, profile):
         """Check if self follows another profile"""
         return self.following.filter(id=profile.id).exists()
@@ -45,18 +42,69 @@ class Profile(models.Model):
         """Check if another profile follows self"""
         return self.followers.filter(id=profile.id).exists()
 
-    
+
+class PostManager(models.Manager):
+    """Like bookkeeping that talks to the likes join table directly.
+
+    Never loads the set of likers: membership, insert and delete are each a
+    single statement on the (post_id, user_id) unique index.
+    """
+
+    def liked_ids(self, user, post_ids):
+        """The subset of ``post_ids`` that ``user`` has liked."""
+        if not user.is_authenticated:
+            return set()
+        PostLike = self.model.likes.through
+        return set(
+            PostLike.objects.filter(user_id=user.id, post_id__in=list(post_ids))
+            .values_list("post_id", flat=True)
+        )
+
+    def add_like(self, post_id, user_id):
+        """Insert the like; returns False if it already existed."""
+        PostLike = self.model.likes.through
+        try:
+            with transaction.atomic():
+                PostLike.objects.create(post_id=post_id, user_id=user_id)
+        except IntegrityError:
+            return False
+        return True
+
+    def remove_like(self, post_id, user_id):
+        """Delete the like; returns False if there was none."""
+        PostLike = self.model.likes.through
+        deleted, _ = PostLike.objects.filter(post_id=post_id, user_id=user_id).delete()
+        return deleted > 0
+
+
 class Post(models.Model):
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PROCESSING, "Processing"), (READY, "Ready"), (FAILED, "Failed")]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     image = CloudinaryField('image', blank=True, null=True)  # ✅ Cloudinary for post images
     caption = models.TextField(blank=True)
     content = models.TextField(blank=True)   # ✅ Added content field
     created_at = models.DateTimeField(auto_now_add=True)
     likes = models.ManyToManyField(User, related_name="liked_posts", blank=True)
+    # Denormalized counters, kept in step by instafinsta.counters
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    # "processing" while its image waits in the upload queue (instafinsta.uploads)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=READY)
+    # Hot posts count into PostCounterShard rows; the columns above hold the rolled-up part
+    counter_shards = models.BooleanField(default=False)
+
+    objects = PostManager()
 
-    @property
-    def like_count(self):
-        return self.likes.count()
+    class Meta:
+        indexes = [
+            # keyset pagination on (created_at, id), globally and per author
+            models.Index(fields=["-created_at", "-id"], name="post_recent_idx"),
+            models.Index(fields=["user", "-created_at", "-id"], name="post_user_recent_idx"),
+        ]
 
     def __str__(self):
         return f"Post by {self.user.username} - {self.caption[:20]}"
@@ -68,6 +116,12 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # a post's comments in keyset order, oldest first
+            models.Index(fields=["post", "created_at", "id"], name="comment_post_time_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} on Post {self.post.id}"
 
@@ -79,14 +133,138 @@ class Message(models.Model):
     is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # one direction of a thread, newest last; a thread is two range scans
+            models.Index(fields=["sender", "receiver", "timestamp"], name="message_pair_time_idx"),
+        ]
+
     def __str__(self):
         return f"From {self.sender} to {self.receiver}: {self.content[:30]}"
-    
-    
+
+
+class Conversation(models.Model):
+    """Inbox summary of the messages between two users.
+
+    One row per pair, with ``user_a`` always the lower user id. Maintained
+    by instafinsta.conversations whenever a message is sent or read.
+    """
+    user_a = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    user_b = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    last_message_at = models.DateTimeField()
+    unread_a = models.PositiveIntegerField(default=0)  # unread by user_a
+    unread_b = models.PositiveIntegerField(default=0)  # unread by user_b
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_a", "user_b"], name="unique_conversation_pair"),
+        ]
+        indexes = [
+            models.Index(fields=["user_a", "-last_message_at", "-id"], name="conversation_a_recent_idx"),
+            models.Index(fields=["user_b", "-last_message_at", "-id"], name="conversation_b_recent_idx"),
+        ]
+
+    def __str__(self):
+        return f"Conversation between {self.user_a_id} and {self.user_b_id}"
+
+    def other_user(self, user):
+        return self.user_b if self.user_a_id == user.id else self.user_a
+
+    def unread_for(self, user):
+        return self.unread_a if self.user_a_id == user.id else self.unread_b
+
+
+class TimelineEntry(models.Model):
+    """A post materialized into one user's home feed (fan-out on write)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    created_at = models.DateTimeField()  # copy of post.created_at so the feed sorts on this table only
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_timeline_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-post"], name="timeline_user_recent_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in timeline of {self.user_id}"
+
+
+class PostCounterShard(models.Model):
+    """One of N counter slices of a hot post (see instafinsta.counters).
+
+    Writers pick a random shard so concurrent likes lock different rows.
+    Values are deltas on top of the post's own columns and may go negative
+    after an unlike; the rollup folds them back into ``Post``.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="counter_shard_rows")
+    shard = models.PositiveSmallIntegerField()
+    like_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "shard"], name="unique_post_counter_shard"),
+        ]
+
+    def __str__(self):
+        return f"Shard {self.shard} of post {self.post_id}"
+
+
+class UploadJob(models.Model):
+    """An image staged on local disk, waiting to be pushed to media storage."""
+    POST_IMAGE = "post_image"
+    AVATAR = "avatar"
+    KIND_CHOICES = [(POST_IMAGE, "Post image"), (AVATAR, "Avatar")]
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()  # Post or Profile id, by kind
+    staged_path = models.CharField(max_length=500)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # when a worker set it RUNNING
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="uploadjob_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} upload for {self.object_id} ({self.status})"
+
+
+class FollowSuggestion(models.Model):
+    """Precomputed "people you may know" for one profile.
+
+    Written in bulk by the ``compute_suggestions`` command; ``candidates`` is
+    a ranked list of ``[profile_id, mutual_count]`` pairs.
+    """
+    profile = models.OneToOneField(Profile, on_delete=models.CASCADE, primary_key=True, related_name="suggestions")
+    candidates = models.JSONField(default=list)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Suggestions for {self.profile_id}"
+
 
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
     if created:
-        Profile.objects.create(user=instance)
-    instance.profile.save()
\ No newline at end of file
+        Profile.objects.create(user=instance, search_name=instance.username.lower())
+        return
+    # Don't re-save the profile on every User save (e.g. last_login): that
+    # would write stale in-memory counters over the F() updates.
+    update_fields = kwargs.get("update_fields")
+    if update_fields is None or "username" in update_fields:
+        Profile.objects.filter(user=instance).update(search_name=instance.username.lower())
\ No newline at end of file
@@ -0,0 +1,155 @@
+import base64
+import json
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_ORDERING = ("-created_at", "-id")
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, ordering, model=None):
+    """Turn a cursor back into the list of ordering values, or raise ValueError.
+
+    With ``model`` each value is also converted by its field's ``to_python``,
+    so a tampered cursor fails here rather than when the query is built.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise ValueError("Invalid cursor")
+    if model is None:
+        return values
+    try:
+        values = [
+            model._meta.get_field(field.lstrip("-")).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except (ValidationError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if None in values:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_filter(ordering, values):
+    """Q object selecting rows strictly after ``values`` in ``ordering``.
+
+    For ("-created_at", "-id") this is
+    ``created_at <= t AND (created_at < t OR (created_at = t AND id < i))``.
+    The redundant bound on the first column lets an index on the same
+    columns seek straight to the cursor instead of scanning the skipped rows.
+    """
+    condition = Q()
+    equal_so_far = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= Q(**equal_so_far, **{f"{name}__{lookup}": value})
+        equal_so_far[name] = value
+    first = ordering[0]
+    return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]}) & condition
+
+
+def _sorted(items, ordering):
+    # stable sorts from the last key to the first, each in its own direction
+    for field in reversed(ordering):
+        items.sort(key=attrgetter(field.lstrip("-")), reverse=field.startswith("-"))
+    return items
+
+
+def keyset_page(queryset, cursor=None, ordering=DEFAULT_ORDERING, page_size=20):
+    """Return ``(items, next_cursor)`` for one page of ``queryset``.
+
+    ``queryset`` may also be a tuple of disjoint querysets, e.g. the two
+    directions of a message thread. Each branch is ordered and limited on
+    its own, so each can walk its own index instead of the database sorting
+    the whole OR of them, and the branches are merged here.
+
+    ``next_cursor`` is None on the last page. Raises ValueError for a
+    malformed cursor.
+    """
+    branches = queryset if isinstance(queryset, tuple) else (queryset,)
+    if cursor:
+        values = decode_cursor(cursor, ordering, branches[0].model)
+        condition = keyset_filter(ordering, values)
+    else:
+        condition = None
+
+    items = []
+    for branch in branches:
+        branch = branch.order_by(*ordering)
+        if condition is not None:
+            branch = branch.filter(condition)
+        items.extend(branch[:page_size + 1])
+    if len(branches) > 1:
+        items = _sorted(items, ordering)[:page_size + 1]
+    if len(items) <= page_size:
+        return items, None
+
+    items = items[:page_size]
+    last = items[-1]
+    return items, encode_cursor([getattr(last, field.lstrip("-")) for field in ordering])
+
+
+def paginate_or_404(queryset, request, ordering=DEFAULT_ORDERING, page_size=20):
+    """``keyset_page`` for template views, reading ``?cursor=`` from the request."""
+    try:
+        return keyset_page(queryset, request.GET.get("cursor"), ordering, page_size)
+    except ValueError:
+        raise Http404("Invalid cursor")
+
+
+class KeysetPagination(BasePagination):
+    """DRF pagination on a ``(created_at, id)`` style key instead of OFFSET.
+
+    Unlike DRF's ``CursorPagination`` the cursor carries every ordering
+    column, so ties on the timestamp never fall back to an offset.
+    """
+    ordering = DEFAULT_ORDERING
+    page_size = 20
+    cursor_query_param = "cursor"
+
+    def __init__(self, ordering=None, page_size=None):
+        if ordering is not None:
+            self.ordering = ordering
+        if page_size is not None:
+            self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            items, self.next_cursor = keyset_page(
+                queryset,
+                request.query_params.get(self.cursor_query_param),
+                self.ordering,
+                self.page_size,
+            )
+        except ValueError:
+            raise NotFound("Invalid cursor")
+        return items
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
@@ -0,0 +1,107 @@
+"""Push channel for new messages and unread counts.
+
+Views publish events to a broker; ``message_stream`` (Server-Sent Events,
+served through ``network.asgi``) relays each user's events to their open
+tabs. The broker is chosen by ``settings.REALTIME_BROKER``; the default
+``InMemoryBroker`` works within one process, so a multi-process deployment
+swaps in a backend with the same ``publish``/``subscribe`` interface.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .serializers import MessageSerializer
+
+DEFAULT_BROKER = "instafinsta.realtime.InMemoryBroker"
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    """One listener's queue, bound to the event loop that created it."""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def deliver(self, event):
+        # publish() runs in sync views on worker threads
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()  # a slow tab loses its oldest event, not the newest
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """Next event, or raise TimeoutError after ``timeout`` seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def publish(self, user_id, event):
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """Return a Subscription; must be called from a running event loop."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # its event loop is gone (client disconnected mid-publish)
+                self.unsubscribe(subscription)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            listeners = self._subscriptions.get(subscription.user_id)
+            if listeners is not None:
+                listeners.discard(subscription)
+                if not listeners:
+                    del self._subscriptions[subscription.user_id]
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, "REALTIME_BROKER", DEFAULT_BROKER))()
+
+
+def publish_message(message, unread_count):
+    """Announce a new message to both participants and the receiver's new unread total."""
+    data = MessageSerializer(message).data
+    broker = get_broker()
+    broker.publish(message.receiver_id, {"type": "message", "message": data})
+    if message.sender_id != message.receiver_id:
+        broker.publish(message.sender_id, {"type": "message", "message": data})
+    publish_unread(message.receiver_id, unread_count)
+
+
+def publish_unread(user_id, unread_count):
+    get_broker().publish(user_id, {"type": "unread", "unread_count": unread_count})
@@ -0,0 +1,62 @@
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+
+from .models import Profile
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_TTL = getattr(settings, "AUTOCOMPLETE_CACHE_TTL", 60)
+
+
+def _prefix_filter(prefix):
+    if connection.vendor == "sqlite":
+        # SQLite never uses an index for LIKE on a default-collation column,
+        # but a range on the lowercased column is a plain b-tree seek.
+        return Q(search_name__gte=prefix, search_name__lt=prefix + "\U0010ffff")
+    # Elsewhere (e.g. Postgres) Django adds a pattern-ops index for db_index
+    # CharFields, so LIKE 'prefix%' is index-backed.
+    return Q(search_name__startswith=prefix)
+
+
+def search_profiles(query, limit=AUTOCOMPLETE_LIMIT):
+    """Profiles whose username starts with ``query``, best matches first.
+
+    Ranking: exact match, then most followed, then shortest name.
+    """
+    prefix = query.strip().lower()
+    if not prefix:
+        return Profile.objects.none()
+    return (
+        Profile.objects.filter(_prefix_filter(prefix))
+        .select_related("user")
+        .annotate(exact=Case(When(search_name=prefix, then=Value(0)), default=Value(1), output_field=IntegerField()))
+        .order_by("exact", "-followers_count", Length("search_name"), "search_name")[:limit]
+    )
+
+
+def autocomplete(query):
+    """Compact ranked matches for ``query``, cached briefly per prefix.
+
+    Hot prefixes (one or two letters) are shared by most typists, so even a
+    short TTL absorbs the bulk of the keystroke traffic.
+    """
+    prefix = query.strip().lower()[:150]
+    if not prefix:
+        return []
+    key = f"autocomplete:{quote(prefix)}"
+    results = cache.get(key)
+    if results is None:
+        results = [
+            {
+                "id": profile.user_id,
+                "username": profile.user.username,
+                "avatar": profile.avatar.url if profile.avatar else None,
+            }
+            for profile in search_profiles(prefix)
+        ]
+        cache.set(key, results, AUTOCOMPLETE_TTL)
+    return results
@@ -1,12 +1,47 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Profile
+from . import thumbnails
+from .models import Comment, Message, Post, Profile
 
 class ProfileSerializer(serializers.ModelSerializer):
+    """Profile with relation counts and links to the paginated follower lists.
+
+    The lists themselves are never inlined: a popular account would put
+    every follower id into one payload.
+    """
+    username = serializers.CharField(source="user.username", read_only=True)
     avatar = serializers.SerializerMethodField()
+    followers_url = serializers.SerializerMethodField()
+    following_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
-        fields = ['id', 'user', 'bio', 'avatar', 'followers', 'following']
+        fields = ['id', 'user', 'username', 'bio', 'avatar', 'followers_count', 'following_count',
+                  'followers_url', 'following_url']
+
+    def get_avatar(self, obj):
+        return obj.avatar.url if obj.avatar else None
+
+    def _link(self, name, obj):
+        url = reverse(name, args=[obj.id])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def get_followers_url(self, obj):
+        return self._link("profile-followers", obj)
+
+    def get_following_url(self, obj):
+        return self._link("profile-following", obj)
+
+
+class ProfileRowSerializer(serializers.ModelSerializer):
+    """Compact profile row for long lists (expects ``select_related("user")``)."""
+    username = serializers.CharField(source="user.username", read_only=True)
+    avatar = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Profile
+        fields = ['id', 'username', 'avatar']
 
     def get_avatar(self, obj):
         return obj.avatar.url if obj.avatar else None
@@ -18,15 +53,52 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
         fields = ['bio', 'avatar']
 
 class ProfileDetailSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+    username = serializers.CharField(source="user.username", read_only=True)
 
     class Meta:
         model = Profile
-        fields = ["id", "user", "bio", "avatar", "followers_count", "following_count"]
+        fields = ["id", "user", "username", "bio", "avatar", "followers_count", "following_count"]
+
+
+class PostSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source="user.username", read_only=True)
+    image = serializers.SerializerMethodField()
+    liked = serializers.BooleanField(source="viewer_has_liked", read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ["id", "user", "username", "image", "caption", "created_at", "like_count", "comment_count", "liked"]
+
+    def get_image(self, obj):
+        return obj.image.url if obj.image else None
+
+
+class CommentSerializer(serializers.ModelSerializer):
+    """Comment with its author; expects ``select_related("user__profile")``."""
+    username = serializers.CharField(source="user.username", read_only=True)
+    avatar = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Comment
+        fields = ["id", "post", "user", "username", "avatar", "content", "created_at"]
+
+    def get_avatar(self, obj):
+        avatar = obj.user.profile.avatar
+        return avatar.url if avatar else None
+
+
+class MessageSerializer(serializers.ModelSerializer):
+    sender_username = serializers.CharField(source="sender.username", read_only=True)
+    image = serializers.SerializerMethodField()
+    image_preview = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Message
+        fields = ["id", "sender", "sender_username", "receiver", "content", "image", "image_preview",
+                  "is_read", "timestamp"]
 
-    def get_followers_count(self, obj):
-        return obj.followers.count()
+    def get_image(self, obj):
+        return obj.image.url if obj.image else None
 
-    def get_following_count(self, obj):
-        return obj.user.following.count()
\ No newline at end of file
+    def get_image_preview(self, obj):
+        return thumbnails.variant_url(obj.image, thumbnails.WIDTHS[0]) or None
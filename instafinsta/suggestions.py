@@ -0,0 +1,142 @@
+"""Offline "people you may know" from the follow graph.
+
+The whole graph is loaded once into CSR arrays (``indptr``/``indices``, one
+row per follower listing who they follow). Candidates for a user are the
+accounts their followees follow; each path counts as one mutual connection,
+and accounts that already follow the user get ``MUTUAL_BOOST`` on top.
+Users are processed in chunks so every step is a NumPy array operation and
+memory stays bounded by the chunk's two-hop fan-out.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import FollowSuggestion, Profile
+
+FollowEdge = Profile.followers.through
+
+TOP_K = getattr(settings, "SUGGESTIONS_TOP_K", 20)
+MUTUAL_BOOST = getattr(settings, "SUGGESTIONS_MUTUAL_BOOST", 3)
+CHUNK_SIZE = 1024
+WRITE_BATCH_SIZE = 1000
+
+
+class FollowGraph:
+    def __init__(self, ids, indptr, indices):
+        self.ids = ids          # row/column index -> Profile id
+        self.indptr = indptr
+        self.indices = indices  # sorted within each row
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls):
+        ids = np.fromiter(Profile.objects.order_by("id").values_list("id", flat=True), dtype=np.int64)
+        # a row of Profile.followers: from = the followed profile, to = the follower
+        edges = FollowEdge.objects.values_list("to_profile_id", "from_profile_id")
+        pairs = np.fromiter((i for edge in edges.iterator(chunk_size=10000) for i in edge), dtype=np.int64)
+        follower = np.searchsorted(ids, pairs[0::2])
+        followee = np.searchsorted(ids, pairs[1::2])
+
+        order = np.lexsort((followee, follower))
+        follower, followee = follower[order], followee[order]
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(follower, minlength=len(ids)), out=indptr[1:])
+        return cls(ids, indptr, followee)
+
+    def edge_keys(self):
+        """Every edge as ``follower * size + followee``, sorted."""
+        rows = np.repeat(np.arange(self.size, dtype=np.int64), np.diff(self.indptr))
+        return rows * self.size + self.indices
+
+    def neighbours(self, rows):
+        """Flattened followees of ``rows``, with the position in ``rows`` each came from."""
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        return np.repeat(np.arange(len(rows)), lengths), self.indices[positions]
+
+
+def _contains(sorted_keys, keys):
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool)
+    found = np.searchsorted(sorted_keys, keys)
+    found[found == len(sorted_keys)] = 0
+    return sorted_keys[found] == keys
+
+
+def top_candidates(graph, rows, edge_keys, top_k=TOP_K):
+    """Yield ``(row, [(candidate_row, mutuals, score), ...])`` for ``rows``."""
+    n = graph.size
+    source, followees = graph.neighbours(rows)
+    owners = rows[source]
+    source, candidates = graph.neighbours(followees)
+    owners = owners[source]
+
+    keys = owners * n + candidates
+    keys = keys[(candidates != owners) & ~_contains(edge_keys, keys)]
+    if not len(keys):
+        return
+    keys, mutuals = np.unique(keys, return_counts=True)
+    owner, candidate = keys // n, keys % n
+    follows_back = _contains(edge_keys, candidate * n + owner)
+    scores = mutuals + MUTUAL_BOOST * follows_back
+
+    order = np.lexsort((candidate, -scores, owner))
+    owner, candidate, mutuals, scores = owner[order], candidate[order], mutuals[order], scores[order]
+    group_starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+    rank = np.arange(len(owner)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(owner)]))
+    keep = rank < top_k
+    owner, candidate, mutuals, scores = owner[keep], candidate[keep], mutuals[keep], scores[keep]
+
+    bounds = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1], True])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield int(owner[start]), list(zip(candidate[start:end].tolist(), mutuals[start:end].tolist(),
+                                          scores[start:end].tolist()))
+
+
+def compute(top_k=TOP_K, chunk_size=CHUNK_SIZE):
+    """Recompute and store suggestions for every profile; returns rows written."""
+    graph = FollowGraph.load()
+    edge_keys = graph.edge_keys()
+    now = timezone.now()
+    rows = []
+    for chunk_start in range(0, graph.size, chunk_size):
+        chunk = np.arange(chunk_start, min(chunk_start + chunk_size, graph.size), dtype=np.int64)
+        for row, ranked in top_candidates(graph, chunk, edge_keys, top_k):
+            rows.append(FollowSuggestion(
+                profile_id=int(graph.ids[row]),
+                candidates=[[int(graph.ids[c]), mutuals] for c, mutuals, _ in ranked],
+                computed_at=now,
+            ))
+
+    with transaction.atomic():
+        FollowSuggestion.objects.all().delete()
+        FollowSuggestion.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+    return len(rows)
+
+
+def for_profile(profile, limit=TOP_K):
+    """Stored suggestions for ``profile`` still worth showing, best first."""
+    stored = FollowSuggestion.objects.filter(profile_id=profile.id).values_list("candidates", flat=True).first()
+    if not stored:
+        return []
+    ids = [profile_id for profile_id, _ in stored]
+    # drop anyone followed since the last run
+    followed = set(
+        FollowEdge.objects.filter(to_profile_id=profile.id, from_profile_id__in=ids)
+        .values_list("from_profile_id", flat=True)
+    )
+    profiles = Profile.objects.select_related("user").in_bulk([i for i in ids if i not in followed])
+    results = []
+    for profile_id, mutuals in stored:
+        if profile_id in profiles:
+            profiles[profile_id].mutual_count = mutuals
+            results.append(profiles[profile_id])
+            if len(results) == limit:
+                break
+    return results
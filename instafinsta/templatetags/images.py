@@ -0,0 +1,17 @@
+from django import template
+
+from instafinsta import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def variant_url(image, width, fmt=thumbnails.FALLBACK_FORMAT):
+    """``{% variant_url post.image 640 %}`` -- one resized variant, for ``src``."""
+    return thumbnails.variant_url(image, width, fmt)
+
+
+@register.simple_tag
+def srcset(image):
+    """``{% srcset post.image %}`` -- every width in IMAGE_VARIANT_WIDTHS, for ``srcset``."""
+    return thumbnails.srcset(image)
@@ -1,3 +1,936 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import AsyncClient, Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import conversations, counters, explore_pool, follows, like_buffer, metrics, realtime, search, suggestions, timeline, unread, uploads
+from .context_processors import global_unread_count
+from .feed import FeedAssembler
+from .models import Comment, Conversation, Message, Post, PostCounterShard, Profile, TimelineEntry, UploadJob
+from .pagination import encode_cursor, keyset_page
+from .realtime import InMemoryBroker
+
+
+class FeedAssemblerQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user("viewer", password="pw")
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.commenters = [User.objects.create_user(f"fan{i}", password="pw") for i in range(3)]
+        cls.author.profile.followers.add(cls.viewer.profile)
+
+    def setUp(self):
+        self.client.force_login(self.viewer)
+
+    def make_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(user=self.author, caption=f"post {i}")
+            post.likes.add(self.viewer, *self.commenters)
+            for user in self.commenters:
+                Comment.objects.create(post=post, user=user, content="nice")
+            counters.incr_post(post.id, like_count=4, comment_count=3)
+            timeline.fan_out_post(post)
+
+    def count_queries(self, url):
+        cache.clear()  # measure every request cold
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_assemble_uses_fixed_number_of_queries(self):
+        self.make_posts(5)
+        posts = FeedAssembler.with_authors(Post.objects.all())
+        with self.assertNumQueries(3):
+            posts = FeedAssembler(self.viewer).assemble(posts)
+            for post in posts:
+                post.user.profile.avatar
+                [c.user.username for c in post.preview_comments]
+
+        self.assertTrue(all(post.viewer_has_liked for post in posts))
+        self.assertEqual({post.like_count for post in posts}, {4})
+        self.assertEqual({post.comment_count for post in posts}, {3})
+        self.assertEqual({len(post.preview_comments) for post in posts}, {2})
+
+    def test_feed_query_count_independent_of_page_size(self):
+        self.make_posts(1)
+        one = self.count_queries(reverse("feed"))
+        self.make_posts(9)
+        ten = self.count_queries(reverse("feed"))
+        self.assertEqual(one, ten)
+
+    def test_profile_query_count_independent_of_page_size(self):
+        url = reverse("view_profile", args=[self.author.username])
+        self.make_posts(1)
+        one = self.count_queries(url)
+        self.make_posts(9)
+        ten = self.count_queries(url)
+        self.assertEqual(one, ten)
+
+    def test_post_detail_query_count_independent_of_comments(self):
+        self.make_posts(1)
+        post = Post.objects.get()
+        url = reverse("post_detail", args=[post.id])
+        few = self.count_queries(url)
+        for user in self.commenters:
+            Comment.objects.create(post=post, user=user, content="again")
+        counters.incr_post(post.id, comment_count=3)
+        self.assertEqual(few, self.count_queries(url))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        now = timezone.now()
+        for i in range(7):
+            post = Post.objects.create(user=self.alice, caption=str(i))
+            # pairs of posts share a created_at, so pages must break ties on id
+            Post.objects.filter(id=post.id).update(created_at=now - datetime.timedelta(seconds=i // 2))
+        self.expected = list(Post.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+    def test_cursor_round_trip_covers_ties(self):
+        seen, cursor = [], None
+        while True:
+            items, cursor = keyset_page(Post.objects.all(), cursor, page_size=2)
+            seen.extend(post.id for post in items)
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_bad_cursor_is_404(self):
+        self.client.force_login(self.alice)
+        for cursor in ("not base64!", encode_cursor(["notadate", "x"]), encode_cursor([None, 1]), encode_cursor([1])):
+            for url in (reverse("feed"), reverse("feed-api"), reverse("view_profile", args=["alice"]), reverse("inbox")):
+                with self.subTest(url=url, cursor=cursor):
+                    self.assertEqual(self.client.get(url, {"cursor": cursor}).status_code, 404)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+        self.post = Post.objects.create(user=self.alice, caption="hi")
+        self.client.force_login(self.bob)
+
+    def test_views_keep_counters_in_step(self):
+        self.client.post(reverse("toggle_like", args=[self.post.id]))
+        self.client.post(reverse("add_comment", args=[self.post.id]), {"content": "hey"})
+        self.client.post(reverse("follow_toggle", args=["alice"]))
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 1))
+        self.assertEqual(Profile.objects.get(user=self.alice).followers_count, 1)
+        self.assertEqual(Profile.objects.get(user=self.bob).following_count, 1)
+
+    def test_reconcile_repairs_drift(self):
+        self.post.likes.add(self.bob)
+        Post.objects.filter(id=self.post.id).update(comment_count=7)
+        call_command("reconcile_counters", batch_size=1, stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+
+
+class LikeTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.posts = [Post.objects.create(user=self.alice) for _ in range(3)]
+        self.client.force_login(self.alice)
+
+    def test_liked_ids_is_one_query(self):
+        self.posts[0].likes.add(self.alice)
+        with self.assertNumQueries(1):
+            liked = Post.objects.liked_ids(self.alice, [post.id for post in self.posts])
+        self.assertEqual(liked, {self.posts[0].id})
+
+    def test_explicit_like_is_idempotent(self):
+        url = reverse("toggle_like", args=[self.posts[0].id])
+        headers = {"x-requested-with": "XMLHttpRequest"}
+        for _ in range(2):
+            data = self.client.post(url, {"action": "like"}, headers=headers).json()
+        self.assertEqual(data, {"liked": True, "like_count": 1})
+
+        data = self.client.post(url, headers=headers).json()
+        self.assertEqual(data, {"liked": False, "like_count": 0})
+
+
+class ConversationTests(TestCase):
+    def setUp(self):
+        # zed is created first, so alice is user_b of that pair and user_a of the rest
+        self.zed = User.objects.create_user("zed", password="pw")
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+        self.carol = User.objects.create_user("carol", password="pw")
+
+    def send(self, sender, receiver, content="hi"):
+        client = Client()
+        client.force_login(sender)
+        client.post(reverse("send_message", args=[receiver.id]), {"content": content},
+                    headers={"x-requested-with": "XMLHttpRequest"})
+        return Message.objects.latest("id")
+
+    def test_summary_tracks_sends_and_reads(self):
+        self.send(self.bob, self.alice)
+        last = self.send(self.bob, self.alice)
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.last_message, last)
+        self.assertEqual(conversation.unread_for(self.alice), 2)
+        self.assertEqual(conversation.unread_for(self.bob), 0)
+
+        reply = self.send(self.alice, self.bob)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message, reply)
+        self.assertEqual(conversation.last_message_at, reply.timestamp)
+        self.assertEqual(conversation.unread_for(self.bob), 1)
+
+        self.client.force_login(self.alice)
+        self.client.get(reverse("message_thread", args=[self.bob.id]))
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.unread_for(self.alice), 0)
+        self.assertEqual(conversation.unread_for(self.bob), 1)
+
+    def test_inbox_pages_merge_both_sides_by_recency(self):
+        for other in (self.bob, self.zed, self.carol):
+            self.send(other, self.alice)
+        self.send(self.alice, self.zed)
+        self.client.force_login(self.alice)
+
+        with mock.patch.object(conversations, "INBOX_PAGE_SIZE", 2):
+            first = self.client.get(reverse("inbox"))
+            second = self.client.get(reverse("inbox"), {"cursor": first.context["next_cursor"]})
+        self.assertEqual([u.username for u in first.context["users"]], ["zed", "carol"])
+        self.assertEqual([u.unread_count for u in first.context["users"]], [1, 1])
+        self.assertEqual([u.username for u in second.context["users"]], ["bob"])
+        self.assertIsNone(second.context["next_cursor"])
+
+
+class MessageThreadTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+        carol = User.objects.create_user("carol", password="pw")
+        start = timezone.now() - datetime.timedelta(days=1)
+        for i in range(60):
+            sender, receiver = (self.alice, self.bob) if i % 2 else (self.bob, self.alice)
+            message = Message.objects.create(sender=sender, receiver=receiver, content=str(i))
+            # three messages per second, so both directions tie on timestamp
+            Message.objects.filter(id=message.id).update(timestamp=start + datetime.timedelta(seconds=i // 3))
+        Message.objects.create(sender=carol, receiver=self.alice, content="other thread")
+        self.expected = [m.id for m in Message.objects.exclude(sender=carol).order_by("timestamp", "id")]
+        self.client.force_login(self.alice)
+
+    def test_thread_renders_latest_page_oldest_first(self):
+        response = self.client.get(reverse("message_thread", args=[self.bob.id]))
+        page_size = conversations.THREAD_PAGE_SIZE
+        self.assertEqual([m.id for m in response.context["messages"]], self.expected[-page_size:])
+        self.assertIsNotNone(response.context["older_cursor"])
+
+    def test_history_pages_continue_without_gaps(self):
+        older_cursor = self.client.get(reverse("message_thread", args=[self.bob.id])).context["older_cursor"]
+        response = self.client.get(reverse("message-history", args=[self.bob.id]), {"cursor": older_cursor})
+        data = response.json()
+        older = self.expected[:-conversations.THREAD_PAGE_SIZE]
+        self.assertEqual([m["id"] for m in data["results"]], older[::-1])
+        self.assertIsNone(data["next"])
+
+        first = self.client.get(reverse("message-history", args=[self.bob.id])).json()
+        self.assertEqual([m["id"] for m in first["results"]], self.expected[::-1][:conversations.THREAD_PAGE_SIZE])
+        self.assertEqual(self.client.get(first["next"]).json()["results"], data["results"])
+
+
+class ExplorePoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user("viewer", password="pw")
+        self.author = User.objects.create_user("author", password="pw")
+        self.posts = [Post.objects.create(user=self.author, caption=str(i)) for i in range(30)]
+
+    def walk(self, user, page_size=7):
+        ids, cursor = [], None
+        while True:
+            posts, cursor = explore_pool.sample_page(user, cursor, page_size=page_size)
+            ids.extend(post.id for post in posts)
+            if cursor is None:
+                return ids
+
+    def test_pages_never_repeat_and_stay_stable_for_a_user(self):
+        first = self.walk(self.viewer)
+        self.assertEqual(sorted(first), sorted(post.id for post in self.posts))
+        self.assertEqual(self.walk(self.viewer), first)
+
+        other = User.objects.create_user("other", password="pw")
+        self.assertNotEqual(self.walk(other), first)
+
+    def test_open_cursor_keeps_its_snapshot(self):
+        page, cursor = explore_pool.sample_page(self.viewer, page_size=10)
+        newcomer = Post.objects.create(user=self.author, caption="new")
+        explore_pool.refresh_pool()
+
+        seen = [post.id for post in page]
+        while cursor is not None:
+            page, cursor = explore_pool.sample_page(self.viewer, cursor, page_size=10)
+            seen.extend(post.id for post in page)
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(sorted(seen), sorted(post.id for post in self.posts))
+        self.assertNotIn(newcomer.id, seen)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for name in ("albert", "alice", "alina", "al", "bob"):
+            User.objects.create_user(name, password="pw")
+        Profile.objects.filter(user__username="alina").update(followers_count=5)
+
+    def test_prefix_ranking(self):
+        names = [profile.user.username for profile in search.search_profiles("AL")]
+        # exact match, then most followed, then shortest
+        self.assertEqual(names, ["al", "alina", "alice", "albert"])
+        self.assertEqual(list(search.search_profiles("  ")), [])
+
+    def test_autocomplete_is_cached_per_prefix(self):
+        self.client.force_login(User.objects.get(username="bob"))
+        response = self.client.get(reverse("user-autocomplete"), {"q": "ali"})
+        self.assertEqual([row["username"] for row in response.json()["results"]], ["alina", "alice"])
+        with self.assertNumQueries(0):
+            self.assertEqual(search.autocomplete("ALI"), response.json()["results"])
+
+
+class InMemoryBrokerTests(TestCase):
+    def test_publish_from_another_thread_reaches_subscriber(self):
+        broker = InMemoryBroker()
+
+        async def listen():
+            subscription = broker.subscribe(7)
+            thread = threading.Thread(target=broker.publish, args=(7, {"type": "unread", "unread_count": 3}))
+            thread.start()
+            try:
+                return await subscription.get(timeout=2)
+            finally:
+                thread.join()
+                subscription.close()
+
+        self.assertEqual(asyncio.run(listen()), {"type": "unread", "unread_count": 3})
+        self.assertEqual(dict(broker._subscriptions), {})
+
+
+class MessageStreamTests(TransactionTestCase):
+    # the ASGI request runs its queries on another thread
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+
+    def test_wsgi_request_gets_no_content(self):
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(reverse("message_stream")).status_code, 204)
+
+    @mock.patch("instafinsta.views.STREAM_HEARTBEAT", 0.01)
+    def test_idle_asgi_stream_sends_keep_alive(self):
+        async def first_chunks():
+            client = AsyncClient()
+            await client.aforce_login(self.alice)
+            response = await client.get(reverse("message_stream"))
+            chunks = []
+            async for chunk in response.streaming_content:
+                chunks.append(chunk)
+                if len(chunks) == 2:
+                    break
+            await response.streaming_content.aclose()
+            return response.status_code, chunks
+
+        with mock.patch("instafinsta.views.connections") as stream_connections:
+            status, chunks = asyncio.run(first_chunks())
+        stream_connections.close_all.assert_called_once_with()  # released before waiting on the broker
+        self.assertEqual(status, 200)
+        self.assertEqual(chunks, [b"retry: 5000\n\n", b": keep-alive\n\n"])
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+
+    def send(self, sender, receiver, content="hi"):
+        client = Client()
+        client.force_login(sender)
+        client.post(reverse("send_message", args=[receiver.id]), {"content": content},
+                    headers={"x-requested-with": "XMLHttpRequest"})
+
+    def test_counter_follows_sends_and_reads(self):
+        self.assertEqual(unread.get_count(self.alice.id), 0)
+        self.send(self.bob, self.alice)
+        self.send(self.bob, self.alice)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.get_count(self.alice.id), 2)
+
+        self.client.force_login(self.alice)
+        self.client.get(reverse("message_thread", args=[self.bob.id]))
+        self.assertEqual(unread.get_count(self.alice.id), 0)
+
+    def test_context_processor_is_lazy(self):
+        self.send(self.bob, self.alice)
+        request = RequestFactory().get("/")
+        request.user = self.alice
+        with self.assertNumQueries(0):
+            context = global_unread_count(request)
+        self.assertEqual(int(str(context["global_unread_count"])), 1)
+
+
+class UnreadCountViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.client.force_login(self.alice)
+
+    def test_unchanged_count_revalidates_with_304(self):
+        response = self.client.get(reverse("unread_count"))
+        self.assertEqual(response.json(), {"unread_count": 0})
+        etag = response["ETag"]
+
+        response = self.client.get(reverse("unread_count"), headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        unread.adjust(self.alice.id, 1)
+        response = self.client.get(reverse("unread_count"), headers={"if-none-match": etag})
+        self.assertEqual(response.json(), {"unread_count": 1})
+        self.assertNotEqual(response["ETag"], etag)
+
+    @mock.patch("instafinsta.views.UNREAD_RECHECK", 0.05)
+    def test_expired_long_poll_answers_304(self):
+        etag = self.client.get(reverse("unread_count"))["ETag"]
+        response = self.client.get(reverse("unread_count"), {"wait": 1}, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_long_poll_wakes_on_publish(self):
+        etag = self.client.get(reverse("unread_count"))["ETag"]
+
+        def new_message():
+            unread.adjust(self.alice.id, 1)
+            realtime.publish_unread(self.alice.id, 1)
+
+        timer = threading.Timer(0.3, new_message)
+        timer.start()
+        started = time.monotonic()
+        try:
+            response = self.client.get(reverse("unread_count"), {"wait": 10}, headers={"if-none-match": etag})
+        finally:
+            timer.join()
+        self.assertEqual(response.json(), {"unread_count": 1})
+        self.assertLess(time.monotonic() - started, 4)  # woken by the publish, not the recheck
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(name, password="pw") for name in ("alice", "bob", "carol")
+        )
+        follows.follow(self.bob.profile, self.alice.profile)
+
+    def timeline_posts(self, user):
+        return list(timeline.home_timeline(user).values_list("post_id", flat=True))
+
+    def test_new_post_fans_out_to_author_and_followers(self):
+        self.client.force_login(self.alice)
+        self.client.post(reverse("create_post"), {"caption": "hello"})
+        post = Post.objects.get()
+        self.assertEqual(self.timeline_posts(self.alice), [post.id])
+        self.assertEqual(self.timeline_posts(self.bob), [post.id])
+        self.assertEqual(self.timeline_posts(self.carol), [])
+
+        self.client.force_login(self.bob)
+        self.assertEqual([p.id for p in self.client.get(reverse("feed")).context["posts"]], [post.id])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        older = Post.objects.create(user=self.alice, caption="older")
+        timeline.fan_out_post(older)
+        own = Post.objects.create(user=self.bob, caption="mine")
+        timeline.fan_out_post(own)
+
+        follows.follow(self.carol.profile, self.alice.profile)
+        self.assertEqual(self.timeline_posts(self.carol), [older.id])
+
+        self.client.force_login(self.bob)
+        self.client.post(reverse("follow_toggle", args=["alice"]))
+        self.assertFalse(follows.is_following(self.bob.profile, self.alice.profile))
+        self.assertEqual(self.timeline_posts(self.bob), [own.id])
+
+
+class FollowTests(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user("viewer", password="pw")
+        self.others = [User.objects.create_user(f"user{i}", password="pw") for i in range(3)]
+        for user in self.others:
+            Post.objects.create(user=user)
+        self.client.force_login(self.viewer)
+
+    def test_bulk_follow_then_unfollow(self):
+        ids = [user.profile.id for user in self.others] + [self.viewer.profile.id]
+        url = reverse("bulk-follow")
+        data = self.client.post(url, {"action": "follow", "profile_ids": ids}, content_type="application/json").json()
+        self.assertEqual(sorted(data["changed"]), sorted(ids[:3]))
+        self.assertEqual(data["following_count"], 3)
+        self.assertEqual(timeline.home_timeline(self.viewer).count(), 3)
+
+        # Following again changes nothing
+        data = self.client.post(url, {"action": "follow", "profile_ids": ids}, content_type="application/json").json()
+        self.assertEqual(data["changed"], [])
+
+        data = self.client.post(url, {"action": "unfollow", "profile_ids": ids[:2]}, content_type="application/json").json()
+        self.assertEqual(data["following_count"], 1)
+        self.assertEqual(timeline.home_timeline(self.viewer).count(), 1)
+
+    def test_bulk_follow_rejects_malformed_bodies(self):
+        url = reverse("bulk-follow")
+        for body in ([1, 2], {"action": "follow", "profile_ids": [self.others[0].profile.id, "2"]},
+                     {"action": "follow", "profile_ids": [True]}):
+            with self.subTest(body=body):
+                response = self.client.post(url, body, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(Profile.objects.get(user=self.viewer).following_count, 0)
+
+
+class SuggestionTests(TestCase):
+    def test_two_hop_candidates_ranked_by_mutuals_and_follow_back(self):
+        me, a, b, c, d, e = (User.objects.create_user(name, password="pw").profile for name in "mabcde")
+        follows.bulk_follow(me, [a, b])
+        follows.bulk_follow(a, [c, d, b])
+        follows.follow(b, c)
+        follows.follow(e, me)   # e follows me back-only: boosted if two hops away
+        follows.follow(b, e)
+        suggestions.compute(top_k=2)
+
+        self.client.force_login(me.user)
+        results = self.client.get(reverse("follow-suggestions")).json()["results"]
+        # e: 1 mutual + follow-back boost; c: 2 mutuals; d (1 mutual) is cut by top_k
+        self.assertEqual([(r["username"], r["mutual_count"]) for r in results], [("e", 1), ("c", 2)])
+
+        follows.follow(me, e)
+        results = self.client.get(reverse("follow-suggestions")).json()["results"]
+        self.assertEqual([r["username"] for r in results], ["c"])
+
+
+class ProfileListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(15):
+            User.objects.create_user(f"user{i}", password="pw")
+
+    def test_fixed_query_budget_and_cache(self):
+        with self.assertNumQueries(2):  # COUNT + page
+            data = self.client.get(reverse("profile-list")).json()
+        self.assertEqual((data["count"], len(data["results"])), (15, 10))
+        self.assertEqual(data["results"][0]["username"], "user14")
+
+        with self.assertNumQueries(1):
+            first = self.client.get(reverse("profile-list"), {"cursor": ""}).json()
+        with self.assertNumQueries(1):
+            second = self.client.get(first["next"]).json()
+        with self.assertNumQueries(0):
+            self.client.get(first["next"])
+        usernames = [row["username"] for row in first["results"] + second["results"]]
+        self.assertEqual(usernames, [f"user{i}" for i in range(14, -1, -1)])
+        self.assertIsNone(second["next"])
+
+
+class RelationListTests(TestCase):
+    def test_followers_are_paginated_compact_rows(self):
+        star = User.objects.create_user("star", password="pw").profile
+        fans = [User.objects.create_user(f"fan{i}", password="pw").profile for i in range(3)]
+        for fan in fans:
+            follows.follow(fan, star)
+
+        detail = self.client.get(reverse("profile-detail", args=[star.id])).json()
+        self.assertEqual(detail["followers_count"], 3)
+        self.assertNotIn("followers", detail)
+
+        rows = self.client.get(detail["followers_url"]).json()["results"]
+        self.assertEqual(rows, [{"id": fan.id, "username": fan.user.username, "avatar": None} for fan in reversed(fans)])
+        following = self.client.get(reverse("profile-following", args=[fans[0].id])).json()["results"]
+        self.assertEqual([row["id"] for row in following], [star.id])
+
+
+class UploadPipelineTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.settings = override_settings(
+            MEDIA_ROOT=media,
+            UPLOAD_STAGING_DIR=os.path.join(media, "staging"),
+            UPLOAD_BACKEND="instafinsta.uploads.FileSystemBackend",
+            UPLOAD_WORKER_THREADS=0,
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        uploads.get_backend.cache_clear()
+        uploads._executor.cache_clear()
+        self.addCleanup(uploads.get_backend.cache_clear)
+        self.addCleanup(uploads._executor.cache_clear)
+
+        self.user = User.objects.create_user("alice", password="pw")
+        self.client.force_login(self.user)
+
+    def image(self):
+        return SimpleUploadedFile("photo.JPG", b"not really a jpeg", content_type="image/jpeg")
+
+    def test_post_is_processing_until_worker_uploads(self):
+        self.client.post(reverse("create_post"), {"caption": "hi", "image": self.image()})
+        post = Post.objects.get()
+        self.assertEqual(post.status, Post.PROCESSING)
+        self.assertFalse(post.image)
+        job = UploadJob.objects.get()
+        self.assertTrue(os.path.exists(job.staged_path))
+
+        call_command("process_uploads", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.READY)
+        self.assertTrue(post.image.public_id.startswith("post_image/"))
+        self.assertFalse(UploadJob.objects.exists())
+        self.assertFalse(os.path.exists(job.staged_path))
+
+    def test_upload_avatar_is_queued(self):
+        response = self.client.post(reverse("upload_avatar"), {"avatar": self.image()})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(uploads.process_pending(), 1)
+        self.assertTrue(Profile.objects.get(user=self.user).avatar.public_id.startswith("avatar/"))
+
+    def test_remove_profile_pic_keeps_concurrent_counter_updates(self):
+        self.client.post(reverse("upload_avatar"), {"avatar": self.image()})
+        uploads.process_pending()
+        profile = Profile.objects.get(user=self.user)
+        stored = profile.avatar.public_id
+
+        def delete_while_someone_follows(public_id):
+            counters.incr_profile(profile.id, followers_count=1)  # lands after the view loaded the profile
+            default_storage.delete(public_id)
+
+        with mock.patch.object(uploads.FileSystemBackend, "delete", side_effect=delete_while_someone_follows):
+            self.client.get(reverse("remove_profile_pic"))
+        profile.refresh_from_db()
+        self.assertFalse(profile.avatar)
+        self.assertEqual(profile.followers_count, 1)
+        self.assertFalse(default_storage.exists(stored))
+
+    def test_job_of_a_dead_worker_is_reclaimed_after_its_lease(self):
+        self.client.post(reverse("create_post"), {"caption": "hi", "image": self.image()})
+        job = UploadJob.objects.get()
+        # a worker claimed the job and was killed before finishing
+        UploadJob.objects.filter(id=job.id).update(status=UploadJob.RUNNING, claimed_at=timezone.now())
+        self.assertEqual(uploads.process_pending(), 0)  # lease still running
+
+        UploadJob.objects.filter(id=job.id).update(
+            claimed_at=timezone.now() - datetime.timedelta(seconds=uploads.LEASE_SECONDS + 1),
+        )
+        self.assertEqual(uploads.process_pending(), 1)
+        self.assertEqual(Post.objects.get().status, Post.READY)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MessageImageVariantTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+        out = BytesIO()
+        Image.new("RGB", (2000, 1000), "red").save(out, "PNG")
+        self.message = Message.objects.create(
+            sender=self.alice, receiver=self.bob,
+            image=SimpleUploadedFile("big.png", out.getvalue(), content_type="image/png"),
+        )
+
+    def test_variant_is_resized_and_kept_on_disk(self):
+        self.client.force_login(self.bob)
+        url = reverse("message_image_variant", args=[self.message.id, 320, "webp"])
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        image = Image.open(BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual((image.format, image.size), ("WEBP", (320, 160)))
+        self.assertTrue(default_storage.exists(f"variants/{self.message.image.name[:-4]}_320.webp"))
+
+        self.assertEqual(self.client.get(reverse("message_image_variant", args=[self.message.id, 333, "webp"])).status_code, 404)
+        self.client.force_login(User.objects.create_user("eve", password="pw"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class PostCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+        self.post = Post.objects.create(user=self.alice, caption="hello")
+        timeline.fan_out_post(self.post)
+        self.client.force_login(self.alice)
+
+    def feed(self):
+        return self.client.get(reverse("feed")).content.decode()
+
+    def test_card_is_cached_until_its_version_is_bumped(self):
+        self.assertNotIn("likes</strong>", self.feed())
+        Post.objects.filter(id=self.post.id).update(like_count=5)
+        self.assertNotIn("5 likes", self.feed())  # served from the fragment cache
+
+        bob = Client()
+        bob.force_login(self.bob)
+        bob.post(reverse("toggle_like", args=[self.post.id]))
+        html = self.feed()
+        self.assertIn("6 likes", html)
+        self.assertIn("bi-heart\"", html)  # alice's own like state is not cached
+
+    def test_reconcile_refreshes_cached_cards(self):
+        PostLike = Post.likes.through
+        PostLike.objects.create(post=self.post, user=self.bob)  # the counter column drifted to 0
+        self.feed()
+        err = StringIO()
+        call_command("reconcile_counters", stdout=StringIO(), stderr=err)
+        self.assertIn("1 like", self.feed())
+        self.assertIn("REDIS_URL", err.getvalue())  # the test cache is per-process LocMem
+
+
+@override_settings(LIKE_BUFFERING=True, LIKE_FLUSH_INTERVAL=0)
+class LikeBufferTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.post = Post.objects.create(user=self.alice)
+        self.buffer = like_buffer.LikeBuffer()
+        like_buffer._buffer, self.saved = self.buffer, like_buffer._buffer
+        self.addCleanup(setattr, like_buffer, "_buffer", self.saved)
+
+    def like(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.post(reverse("toggle_like", args=[self.post.id]),
+                           headers={"x-requested-with": "XMLHttpRequest"}).json()
+
+    def test_events_coalesce_into_one_flush(self):
+        bob, carol = (User.objects.create_user(name, password="pw") for name in ("bob", "carol"))
+        counts = [self.like(user)["like_count"] for user in (bob, carol, bob, bob)]
+        self.assertEqual(counts, [1, 2, 1, 2])
+        self.assertFalse(self.post.likes.exists())
+
+        with self.assertNumQueries(4):  # savepoint, bulk insert, counter update, release
+            self.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.likes.count()), (2, 2))
+
+        self.assertEqual(self.like(bob), {"liked": False, "like_count": 1})
+        self.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.likes.count()), (1, 1))
+
+    def test_toggle_during_a_flush_sees_the_flushing_state(self):
+        bob = User.objects.create_user("bob", password="pw")
+        self.like(bob)
+        bulk_create = like_buffer.PostLike.objects.bulk_create
+
+        def unlike_mid_flush(*args, **kwargs):
+            # bob's like is swapped out but not yet written
+            self.assertEqual(self.like(bob)["liked"], False)
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(like_buffer.PostLike.objects, "bulk_create", side_effect=unlike_mid_flush):
+            self.buffer.flush()
+        self.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.likes.count()), (0, 0))
+
+    def test_failed_flush_keeps_events(self):
+        bob, carol = (User.objects.create_user(name, password="pw") for name in ("bob", "carol"))
+        self.like(bob)
+        self.like(carol)
+        with mock.patch.object(like_buffer.PostLike.objects, "bulk_create", side_effect=OperationalError("database is locked")):
+            with self.assertRaises(OperationalError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.pending_delta(self.post.id), 2)
+
+        self.assertEqual(self.like(carol), {"liked": False, "like_count": 1})  # recorded after the failure
+        self.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, list(self.post.likes.all())), (1, [bob]))
+
+
+class ShardedCounterTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.post = Post.objects.create(user=self.alice)
+        self.fans = [User.objects.create_user(f"fan{i}", password="pw") for i in range(4)]
+
+    def like(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.post(reverse("toggle_like", args=[self.post.id]),
+                           headers={"x-requested-with": "XMLHttpRequest"}).json()["like_count"]
+
+    def test_hot_post_switches_to_shards_and_rolls_up(self):
+        with mock.patch.object(counters, "SHARD_THRESHOLD", 2):
+            counts = [self.like(fan) for fan in self.fans]
+        self.assertEqual(counts, [1, 2, 3, 4])
+
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.counter_shards)
+        self.assertEqual(self.post.like_count, 2)  # the last two live in shards
+        self.assertEqual(FeedAssembler(self.alice).assemble([self.post])[0].like_count, 4)
+
+        call_command("rollup_counters", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 4)
+        self.assertFalse(PostCounterShard.objects.exclude(like_count=0).exists())
+
+    def like_as(self, user, action):
+        client = Client()
+        client.force_login(user)
+        return client.post(reverse("toggle_like", args=[self.post.id]), {"action": action},
+                           headers={"x-requested-with": "XMLHttpRequest"}).json()["like_count"]
+
+    def test_every_like_response_counts_shards(self):
+        with mock.patch.object(counters, "SHARD_THRESHOLD", 0):
+            self.assertEqual([self.like(fan) for fan in self.fans[:3]], [1, 2, 3])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)  # the other two live in shards
+
+        self.assertEqual(self.like_as(self.fans[0], "like"), 3)  # idempotent retry
+        with override_settings(LIKE_BUFFERING=True, LIKE_FLUSH_INTERVAL=0):
+            buffer = like_buffer.LikeBuffer()
+            with mock.patch.object(like_buffer, "_buffer", buffer):
+                self.assertEqual(self.like(self.fans[3]), 4)
+                self.assertEqual(self.like_as(self.fans[3], "like"), 4)
+
+
+class CommentTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.post = Post.objects.create(user=self.alice)
+        self.client.force_login(self.alice)
+
+    def comment(self, content, **headers):
+        return self.client.post(reverse("add_comment", args=[self.post.id]), {"content": content},
+                                headers={"x-requested-with": "XMLHttpRequest", **headers})
+
+    def test_add_comment_returns_json_or_fragment(self):
+        data = self.comment("first").json()
+        self.assertEqual((data["comment"]["username"], data["comment"]["content"]), ("alice", "first"))
+        html = self.comment("second", accept="text/html").content.decode()
+        self.assertIn("<strong>alice</strong> second", html)
+        self.assertEqual(self.comment("   ").status_code, 400)
+
+    def test_detail_renders_first_page_and_api_pages_the_rest(self):
+        for i in range(25):
+            self.comment(f"c{i}")
+        response = self.client.get(reverse("post_detail", args=[self.post.id]))
+        self.assertEqual(len(response.context["post"].preview_comments), 20)
+
+        url = f"{reverse('post-comments', args=[self.post.id])}?cursor={response.context['comments_cursor']}"
+        data = self.client.get(url).json()
+        self.assertEqual([c["content"] for c in data["results"]], [f"c{i}" for i in range(20, 25)])
+        self.assertIsNone(data["next"])
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN=None)
+class MetricsTests(TestCase):
+    def setUp(self):
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+        self.client.force_login(User.objects.create_user("alice", password="pw"))
+
+    def test_views_are_recorded_and_exposed(self):
+        self.client.get(reverse("feed"))
+        self.client.get(reverse("feed"))
+        response = self.client.get(reverse("metrics"))
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn('instafinsta_request_duration_seconds_count{view="feed"} 2', body)
+        self.assertIn('instafinsta_request_sql_queries_count{view="feed"} 2', body)
+        self.assertIn('instafinsta_request_template_duration_seconds_bucket{view="feed",le="+Inf"} 2', body)
+        self.assertNotIn('instafinsta_request_sql_queries_bucket{view="feed",le="0"} 1', body)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_endpoint_is_opt_in(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN=None)
+class AsyncMetricsTests(TransactionTestCase):
+    # the ASGI request runs its queries on another thread
+
+    def setUp(self):
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+        self.alice = User.objects.create_user("alice", password="pw")
+
+    def test_asgi_requests_record_sql(self):
+        async def get_pages():
+            client = AsyncClient()
+            await client.aforce_login(self.alice)
+            await client.get(reverse("feed"))
+            await client.get(reverse("unread_count"))
+
+        asyncio.run(get_pages())
+        body = metrics.render()
+        self.assertIn('instafinsta_request_sql_queries_count{view="feed"} 1', body)
+        self.assertNotIn('instafinsta_request_sql_queries_bucket{view="feed",le="0"} 1', body)
+        # an async view: its ORM calls go through sync_to_async
+        self.assertNotIn('instafinsta_request_sql_queries_bucket{view="unread_count",le="0"} 1', body)
+
+
+class SeedAndBenchTests(TestCase):
+    def test_seeded_graph_is_consistent_and_benchable(self):
+        call_command(
+            "seed_social_graph", users=15, avg_follows=4, posts_per_user=2, likes_per_post=3,
+            comments_per_post=1, threads_per_user=1, messages_per_thread=4, stdout=StringIO(),
+        )
+        self.assertEqual(Profile.objects.filter(user__username__startswith="seed_").count(), 15)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertTrue(Conversation.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("0 post(s) and 0 profile(s)", out.getvalue())
+
+        out = StringIO()
+        call_command("bench_views", iterations=2, viewers=2, warmup=0, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report["views"]), {"feed", "explore", "inbox", "message_thread", "profile", "profile_list"})
+        self.assertTrue(all(view["statuses"] == [200] for view in report["views"].values()))
+
+
+class ReplayAccessLogTests(TransactionTestCase):
+    # replayed requests run on other threads, which only see committed rows
+
+    def test_replay_reports_per_endpoint_statuses(self):
+        alice = User.objects.create_user("alice", password="pw")
+        post = Post.objects.create(user=alice, caption="hi")
+        entries = [
+            {"ts": 0, "path": "/feed/", "user": "alice"},
+            {"ts": 0.01, "path": "/api/profiles/", "user": "alice"},
+            {"ts": 0.02, "method": "POST", "path": f"/toggle-like/{post.id}/", "user": "alice"},
+            {"ts": 0.03, "path": "/messages/stream/", "user": "alice"},
+            {"ts": 0.04, "path": "/no-such-page/"},
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write("\n".join(json.dumps(entry) for entry in entries))
+        self.addCleanup(os.remove, f.name)
+
+        for target in ("wsgi", "asgi"):
+            out = StringIO()
+            call_command("replay_access_log", f.name, target=target, concurrency=1, stdout=out)
+            report = json.loads(out.getvalue())
+            self.assertEqual(report["overall"]["requests"], 4)  # the SSE stream is excluded
+            self.assertEqual(report["overall"]["errors"], 0)
+            self.assertEqual(report["endpoints"]["feed"]["statuses"], {"200": 1})
+            self.assertEqual(report["endpoints"]["profile-list"]["statuses"], {"200": 1})
+            self.assertNotIn("403", report["endpoints"]["toggle_like"]["statuses"])
+            self.assertEqual(report["endpoints"]["unmatched"]["statuses"], {"404": 1})
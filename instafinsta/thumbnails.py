@@ -0,0 +1,65 @@
+"""Resized variants of uploaded images, for ``srcset``.
+
+Message images live in local media storage, so their variants are made
+with Pillow the first time they are requested and kept on disk next to
+the originals (``variants/``). Post images and avatars are Cloudinary
+resources; for those the variant is just a transformation URL.
+"""
+import os
+from io import BytesIO
+
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+WIDTHS = tuple(getattr(settings, "IMAGE_VARIANT_WIDTHS", (320, 640, 1080)))
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+SRCSET_FORMAT = "webp"
+FALLBACK_FORMAT = "jpeg"
+QUALITY = 80
+
+
+def variant_name(name, width, fmt):
+    base, _ = os.path.splitext(name)
+    return f"variants/{base}_{width}.{fmt}"
+
+
+def render_variant(name, width, fmt):
+    """Storage name of ``name`` scaled to at most ``width`` px wide, made if missing."""
+    target = variant_name(name, width, fmt)
+    if default_storage.exists(target):
+        return target
+
+    with default_storage.open(name, "rb") as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    out = BytesIO()
+    image.save(out, FORMATS[fmt], quality=QUALITY)
+    saved = default_storage.save(target, ContentFile(out.getvalue()))
+    if saved != target:
+        # another request rendered it first; keep theirs
+        default_storage.delete(saved)
+    return target
+
+
+def variant_url(image, width, fmt=FALLBACK_FORMAT):
+    """URL of ``image`` (a Cloudinary resource or a Message image) at ``width``."""
+    if not image:
+        return ""
+    if isinstance(image, CloudinaryResource):
+        return image.build_url(width=width, crop="limit", fetch_format="auto", quality="auto", secure=True)
+    return reverse("message_image_variant", args=[image.instance.id, width, fmt])
+
+
+def srcset(image):
+    if not image:
+        return ""
+    return ", ".join(f"{variant_url(image, width, SRCSET_FORMAT)} {width}w" for width in WIDTHS)
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Post, Profile, TimelineEntry
+
+# How many posts a timeline is seeded with when a user follows someone
+# or when timelines are rebuilt from scratch.
+BACKFILL_LIMIT = getattr(settings, "TIMELINE_BACKFILL_LIMIT", 200)
+FANOUT_BATCH_SIZE = getattr(settings, "TIMELINE_FANOUT_BATCH_SIZE", 1000)
+FEED_PAGE_SIZE = getattr(settings, "FEED_PAGE_SIZE", 20)
+TIMELINE_ORDERING = ("-created_at", "-post_id")
+
+FollowEdge = Profile.followers.through
+
+
+def follower_user_ids(user_id):
+    """User ids of everyone following ``user_id`` (one query, no model instances)."""
+    return FollowEdge.objects.filter(
+        from_profile__user_id=user_id
+    ).values_list("to_profile__user_id", flat=True)
+
+
+def fan_out_post(post):
+    """Push a new post into the timelines of its author and all of their followers."""
+    recipients = [post.user_id]
+    recipients.extend(follower_user_ids(post.user_id).iterator(chunk_size=FANOUT_BATCH_SIZE))
+    entries = (
+        TimelineEntry(user_id=user_id, post_id=post.id, created_at=post.created_at)
+        for user_id in recipients
+    )
+    _bulk_insert(entries)
+
+
+def add_followee_posts(user, followee):
+    """Seed ``user``'s timeline with the latest posts of someone they just followed."""
+    add_followees_posts(user, [followee.id])
+
+
+def add_followees_posts(user, followee_ids):
+    """``add_followee_posts`` for many followees in one query (latest N per author)."""
+    if not followee_ids:
+        return
+    posts = Post.objects.filter(user_id__in=followee_ids)
+    if len(followee_ids) > 1:
+        posts = posts.annotate(
+            rank=Window(RowNumber(), partition_by=F("user_id"), order_by=[F("created_at").desc(), F("id").desc()])
+        ).filter(rank__lte=BACKFILL_LIMIT)
+    else:
+        posts = posts.order_by("-created_at", "-id")[:BACKFILL_LIMIT]
+    entries = (
+        TimelineEntry(user_id=user.id, post_id=post_id, created_at=created_at)
+        for post_id, created_at in posts.values_list("id", "created_at")
+    )
+    _bulk_insert(entries)
+
+
+def remove_followee_posts(user, followee):
+    remove_followees_posts(user, [followee.id])
+
+
+def remove_followees_posts(user, followee_ids):
+    if followee_ids:
+        TimelineEntry.objects.filter(user=user, post__user_id__in=followee_ids).delete()
+
+
+def rebuild_timeline(user):
+    """Recreate a timeline from the follow graph, e.g. after a bulk import."""
+    followees = Profile.objects.filter(followers__user=user).values_list("user_id", flat=True)
+    posts = Post.objects.filter(
+        user_id__in=[user.id, *followees]
+    ).order_by("-created_at", "-id").values_list("id", "created_at")[:BACKFILL_LIMIT]
+
+    TimelineEntry.objects.filter(user=user).delete()
+    _bulk_insert(
+        TimelineEntry(user_id=user.id, post_id=post_id, created_at=created_at)
+        for post_id, created_at in posts
+    )
+
+
+def home_timeline(user):
+    """Timeline entries of ``user``, newest first, with their posts attached."""
+    return (
+        TimelineEntry.objects.filter(user=user)
+        .select_related("post__user__profile")
+        .order_by(*TIMELINE_ORDERING)
+    )
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Message
+
+CACHE_TTL = getattr(settings, "UNREAD_CACHE_TTL", 300)
+
+
+def _key(user_id):
+    return f"unread:{user_id}"
+
+
+def get_count(user_id):
+    """Unread messages for ``user_id``, from cache when possible."""
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = Message.objects.filter(receiver_id=user_id, is_read=False).count()
+        # add() rather than set(): don't clobber a value adjust() just wrote
+        cache.add(_key(user_id), count, CACHE_TTL)
+    return count
+
+
+def adjust(user_id, delta):
+    """Move a cached counter by ``delta``; an uncached one is left to be recounted."""
+    try:
+        count = cache.incr(_key(user_id), delta)
+    except ValueError:
+        return
+    if count < 0:
+        cache.delete(_key(user_id))
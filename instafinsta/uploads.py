@@ -0,0 +1,183 @@
+"""Background upload stage for post images and avatars.
+
+Views call ``stage()``: the file is written to local disk, an UploadJob row
+is recorded and the request returns immediately. A worker -- a small
+in-process thread pool, or the ``process_uploads`` command -- pushes the
+file to the backend named by ``settings.UPLOAD_BACKEND`` and fills in the
+image field. Posts stay "processing" until then. A job whose worker died
+mid-upload stays RUNNING until its lease (``UPLOAD_LEASE_SECONDS``) runs
+out; ``process_pending`` then counts it as a failed attempt and retries it.
+"""
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .feed import bump_card_version
+from .models import Post, Profile, UploadJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "instafinsta.uploads.CloudinaryBackend"
+MAX_ATTEMPTS = 3
+# longer than any single upload should take, so only jobs of dead workers expire
+LEASE_SECONDS = getattr(settings, "UPLOAD_LEASE_SECONDS", 600)
+
+
+class UploadBackend:
+    def store(self, path, kind):
+        """Upload the file at ``path``; return the value for the CloudinaryField."""
+        raise NotImplementedError
+
+    def delete(self, public_id):
+        """Remove a stored file, e.g. an avatar the user took down."""
+        raise NotImplementedError
+
+
+class CloudinaryBackend(UploadBackend):
+    def store(self, path, kind):
+        from cloudinary import uploader
+
+        with open(path, "rb") as f:
+            return uploader.upload_resource(f, type="upload", resource_type="image")
+
+    def delete(self, public_id):
+        from cloudinary import uploader
+
+        uploader.destroy(public_id, resource_type="image")
+
+
+class FileSystemBackend(UploadBackend):
+    """Stand-in for tests and local development: copies into MEDIA_ROOT."""
+
+    def __init__(self):
+        self.storage = FileSystemStorage()
+
+    def store(self, path, kind):
+        with open(path, "rb") as f:
+            return self.storage.save(f"{kind}/{os.path.basename(path)}", f)
+
+    def delete(self, public_id):
+        self.storage.delete(public_id)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(getattr(settings, "UPLOAD_BACKEND", DEFAULT_BACKEND))()
+
+
+@lru_cache(maxsize=None)
+def _executor():
+    workers = getattr(settings, "UPLOAD_WORKER_THREADS", 2)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") if workers else None
+
+
+def _staging_dir():
+    return getattr(settings, "UPLOAD_STAGING_DIR", os.path.join(settings.MEDIA_ROOT, "staging"))
+
+
+def stage(uploaded_file, kind, object_id):
+    """Save ``uploaded_file`` locally and queue it; returns the UploadJob."""
+    directory = _staging_dir()
+    os.makedirs(directory, exist_ok=True)
+    _, ext = os.path.splitext(uploaded_file.name)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}{ext.lower()[:10]}")
+    with open(path, "wb") as out:
+        for chunk in uploaded_file.chunks():
+            out.write(chunk)
+
+    job = UploadJob.objects.create(kind=kind, object_id=object_id, staged_path=path)
+    executor = _executor()
+    if executor is not None:
+        transaction.on_commit(lambda: executor.submit(_run_in_thread, job.id))
+    return job
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        process(job_id)
+    except Exception:
+        logger.exception("Upload job %s crashed", job_id)
+    finally:
+        close_old_connections()
+
+
+def process(job_id):
+    """Upload one pending job; returns True if it completed.
+
+    The job is claimed with a conditional UPDATE, so threads and the
+    management command can safely race for the same row.
+    """
+    claimed = UploadJob.objects.filter(id=job_id, status=UploadJob.PENDING).update(
+        status=UploadJob.RUNNING, claimed_at=timezone.now(),
+    )
+    if not claimed:
+        return False
+    job = UploadJob.objects.get(id=job_id)
+    try:
+        value = get_backend().store(job.staged_path, job.kind)
+    except Exception as exc:
+        _failed(job, exc)
+        return False
+
+    _apply(job, value)
+    job.delete()
+    try:
+        os.remove(job.staged_path)
+    except OSError:
+        pass
+    return True
+
+
+def _apply(job, value):
+    if job.kind == UploadJob.POST_IMAGE:
+        image = Post._meta.get_field("image").get_prep_value(value)
+        Post.objects.filter(id=job.object_id).update(image=image, status=Post.READY)
+        bump_card_version(job.object_id)
+    else:
+        avatar = Profile._meta.get_field("avatar").get_prep_value(value)
+        Profile.objects.filter(id=job.object_id).update(avatar=avatar)
+
+
+def _failed(job, exc):
+    logger.warning("Upload job %s failed: %s", job.id, exc)
+    attempts = job.attempts + 1
+    status = UploadJob.FAILED if attempts >= MAX_ATTEMPTS else UploadJob.PENDING
+    UploadJob.objects.filter(id=job.id).update(status=status, attempts=attempts, error=str(exc))
+    if status == UploadJob.FAILED and job.kind == UploadJob.POST_IMAGE:
+        Post.objects.filter(id=job.object_id).update(status=Post.FAILED)
+        bump_card_version(job.object_id)
+
+
+def reclaim_expired():
+    """Put RUNNING jobs whose lease ran out back in the queue; returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=LEASE_SECONDS)
+    expired = list(UploadJob.objects.filter(
+        # no claimed_at: claimed before the column existed
+        Q(claimed_at__lt=cutoff) | Q(claimed_at=None), status=UploadJob.RUNNING,
+    ))
+    for job in expired:
+        _failed(job, RuntimeError("worker lease expired"))
+    return len(expired)
+
+
+def process_pending(limit=None):
+    """Work through pending jobs oldest first; returns how many completed.
+
+    Jobs left RUNNING by a worker that died are reclaimed first.
+    """
+    reclaim_expired()
+    ids = UploadJob.objects.filter(status=UploadJob.PENDING).order_by("id").values_list("id", flat=True)
+    if limit:
+        ids = ids[:limit]
+    return sum(process(job_id) for job_id in list(ids))
@@ -21,6 +21,16 @@ urlpatterns = [
     path("toggle-follow/<str:username>/", views.toggle_follow, name="follow_toggle"),
     path("toggle-like/<int:post_id>/", views.toggle_like, name="toggle_like"),
     path('api/profiles/', profile_list, name="profile-list"),
+    path('api/profiles/<int:profile_id>/', profile_detail_api, name="profile-detail"),
+    path('api/profiles/<int:profile_id>/followers/', profile_followers_api, name="profile-followers"),
+    path('api/profiles/<int:profile_id>/following/', profile_following_api, name="profile-following"),
+    path('api/feed/', feed_api, name="feed-api"),
+    path('api/users/autocomplete/', user_autocomplete, name="user-autocomplete"),
+    path('api/messages/<int:user_id>/', message_history_api, name="message-history"),
+    path('api/posts/<int:post_id>/comments/', post_comments_api, name="post-comments"),
+    path('api/follows/bulk/', bulk_follow_api, name="bulk-follow"),
+    path('api/profile/avatar/', upload_avatar, name="upload_avatar"),
+    path('api/suggestions/', follow_suggestions_api, name="follow-suggestions"),
     path("post/<int:post_id>/delete/", delete_post, name="delete_post"),
     path("comment/<int:post_id>/", add_comment, name="add_comment"),
     path("send/<int:user_id>/", send_message, name="send_message"),
@@ -28,6 +38,9 @@ urlpatterns = [
     path("profile/", profile, name="my_profile"),
     path("profile/<str:username>/", profile, name="view_profile"),
     path("unread-messages-count/", unread_count, name="unread_count"),
+    path("messages/stream/", message_stream, name="message_stream"),
+    path("metrics", prometheus_metrics, name="metrics"),
+    path("messages/image/<int:message_id>/<int:width>.<str:fmt>", message_image_variant, name="message_image_variant"),
     path("messages/<int:user_id>/", views.message_thread, name="message_thread"),
     path('create_test_user/', views.create_test_user, name='create_test_user'),
 ]
@@ -65,13 +65,30 @@ def create_test_user(request):
 
 # ... rest of the views unchanged ...
 from django.contrib.auth.models import User
-from django.http import HttpResponseForbidden, JsonResponse
+import asyncio
+import hashlib
+import json
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.core.files.uploadedfile import UploadedFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from django.contrib import messages
-from instafinsta.serializers import ProfileDetailSerializer, ProfileSerializer, ProfileUpdateSerializer
-from .models import Profile, Post, Comment, Message
+from instafinsta.serializers import CommentSerializer, MessageSerializer, PostSerializer, ProfileDetailSerializer, ProfileRowSerializer, ProfileSerializer, ProfileUpdateSerializer
+from .models import Profile, Post, Comment, Message, UploadJob
 from .forms import PostForm, ProfileForm, MessageForm, UserForm, UserUpdateForm
+from . import conversations, counters, explore_pool, follows, like_buffer, metrics, realtime, search, suggestions, thumbnails, timeline, unread, uploads
+from .feed import COMMENT_ORDERING, COMMENT_PAGE_SIZE, FeedAssembler, bump_card_version, post_comments
+from .pagination import KeysetPagination, encode_cursor, keyset_page, paginate_or_404
 from django.db.models import Q, Max, Count
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import parser_classes
@@ -119,14 +136,14 @@ def view_profile(request, username):
     user_profile = get_object_or_404(User, username=username)
     profile = get_object_or_404(Profile, user=user_profile)
     is_owner = (request.user == user_profile)
-    followers_count = profile.followers.count()
-    following_count = profile.following.count()
+    followers_count = profile.followers_count
+    following_count = profile.following_count
     posts = Post.objects.filter(author=user_profile).order_by("-created_at")
 
     if request.method == "POST" and is_owner:
         if "avatar" in request.FILES:  # Legacy field name, adjust if needed
             profile.avatar = request.FILES["avatar"]  # Use 'avatar' to match CloudinaryField
-            profile.save()
+            profile.save(update_fields=["avatar"])  # a full save would overwrite the counters
             messages.success(request, "Profile picture updated successfully!")
             return redirect("view_profile", username=username)
 
@@ -146,9 +163,16 @@ def edit_profile(request):
         profile_form = ProfileForm(request.POST, request.FILES, instance=request.user.profile)
         if user_form.is_valid() and profile_form.is_valid():
             user_form.save()
-            profile_form.save()
+            # Only write the edited columns so stored counters aren't clobbered;
+            # a new avatar is queued and written by the upload worker instead
+            avatar = profile_form.cleaned_data.get("avatar")
+            fields = [f for f in profile_form.Meta.fields if f != "avatar" or not isinstance(avatar, UploadedFile)]
+            profile = profile_form.save(commit=False)
+            profile.save(update_fields=fields)
+            if isinstance(avatar, UploadedFile):
+                uploads.stage(avatar, UploadJob.AVATAR, profile.id)
             messages.success(request, "Profile updated successfully!")
-            return redirect("profile", username=request.user.username)
+            return redirect("view_profile", username=request.user.username)
     else:
         user_form = UserUpdateForm(instance=request.user)
         profile_form = ProfileForm(instance=request.user.profile)
@@ -159,18 +183,18 @@ def edit_profile(request):
 
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
+@permission_classes([IsAuthenticated])
 def upload_avatar(request):
     profile = get_object_or_404(Profile, user=request.user)
-    serializer = ProfileUpdateSerializer(instance=profile, data=request.data, partial=True)
-
-    if serializer.is_valid():
-        serializer.save()
-        return Response({
-            "message": "Avatar uploaded successfully!",
-            "avatar_url": profile.avatar.url
-        }, status=201)
-
-    return Response(serializer.errors, status=400)
+    avatar = request.FILES.get("avatar")
+    if avatar is None:
+        return Response({"avatar": ["No file was submitted."]}, status=400)
+
+    job = uploads.stage(avatar, UploadJob.AVATAR, profile.id)
+    return Response({
+        "message": "Avatar upload queued",
+        "job_id": job.id,
+    }, status=202)
     
 
 
@@ -179,8 +203,11 @@ def upload_avatar(request):
 def remove_profile_pic(request):
     profile = request.user.profile
     if profile.avatar:  # Use 'avatar' to match CloudinaryField
-        profile.avatar.delete(save=True)  # Deletes file from Cloudinary and clears DB field
-    return redirect('profile')
+        uploads.get_backend().delete(profile.avatar.public_id)
+        # Only the avatar column: a full save would write back stale counters
+        profile.avatar = None
+        profile.save(update_fields=["avatar"])
+    return redirect('view_profile', username=request.user.username)
 
 @login_required
 def my_profile(request):
@@ -198,7 +225,15 @@ def create_post(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.user = request.user   # ✅ lowercase 'user'
+            # The image goes to storage in the background, not in this request
+            image = form.cleaned_data.get("image")
+            if isinstance(image, UploadedFile):
+                post.image = None
+                post.status = Post.PROCESSING
             post.save()
+            if post.status == Post.PROCESSING:
+                uploads.stage(image, UploadJob.POST_IMAGE, post.id)
+            timeline.fan_out_post(post)
             return redirect("feed")
     else:
         form = PostForm()
@@ -206,61 +241,88 @@ def create_post(request):
 
 @login_required
 def feed(request):
-    posts = Post.objects.all().order_by('-created_at')
-    return render(request, 'feed.html', {'posts': posts})
+    # Read the viewer's pre-sorted timeline instead of sorting every post
+    entries, next_cursor = paginate_or_404(
+        timeline.home_timeline(request.user), request,
+        ordering=timeline.TIMELINE_ORDERING, page_size=timeline.FEED_PAGE_SIZE,
+    )
+    posts = FeedAssembler(request.user).assemble(entry.post for entry in entries)
+    return render(request, 'feed.html', {'posts': posts, 'next_cursor': next_cursor})
 
 @login_required
 def delete_post(request, post_id):
     post = get_object_or_404(Post, id=post_id, user=request.user)
     if request.method == "POST":
         post.delete()
+        bump_card_version(post_id)
         return JsonResponse({"success": True, "post_id": post_id})
     return JsonResponse({"success": False}, status=400)
 
 
 @login_required
 def add_comment(request, post_id):
+    """Add a comment; AJAX callers get it back as JSON, or as HTML when they accept it."""
     post = get_object_or_404(Post, id=post_id)
-    if request.method == "POST":
-        content = request.POST.get("content")
-        if content.strip():
-            Comment.objects.create(post=post, user=request.user, content=content)
-    return redirect(request.META.get("HTTP_REFERER", "feed"))
+    is_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
+    content = (request.POST.get("content") or "").strip()
+    if request.method != "POST" or not content:
+        if is_ajax:
+            return JsonResponse({"success": False, "error": "Comment cannot be empty"}, status=400)
+        return redirect(request.META.get("HTTP_REFERER", "feed"))
+
+    comment = Comment.objects.create(post=post, user=request.user, content=content)
+    counters.bump_post(post, comment_count=1)
+    bump_card_version(post.id)
+
+    if not is_ajax:
+        return redirect(request.META.get("HTTP_REFERER", "feed"))
+    if "text/html" in request.headers.get("accept", ""):
+        return render(request, "partials/comment.html", {"comment": comment})
+    return JsonResponse({"success": True, "comment": CommentSerializer(comment).data}, status=201)
 
 @login_required
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    return render(request, "post_detail.html", {"post": post})
+    # First page of comments only; the rest come from post_comments_api
+    post = get_object_or_404(FeedAssembler.with_authors(Post.objects), id=post_id)
+    FeedAssembler(request.user, comment_limit=COMMENT_PAGE_SIZE).assemble([post])
+    comments_cursor = None
+    if post.comment_count > len(post.preview_comments):
+        last = post.preview_comments[-1] if post.preview_comments else None
+        comments_cursor = encode_cursor([last.created_at, last.id]) if last else ""
+    return render(request, "post_detail.html", {"post": post, "comments_cursor": comments_cursor})
 
 # ---------------------------
 # Messaging Views
 # ---------------------------
+STREAM_HEARTBEAT = 25  # seconds between keep-alive comments on idle streams
+UNREAD_MAX_WAIT = 30  # longest a long-poll on unread_count is held open
+UNREAD_RECHECK = 5
+
 @login_required
 def inbox(request):
-    # Show all users except self
-    users = User.objects.exclude(id=request.user.id)
-
-    # Add unread message count for each user
-    for user in users:
-        user.unread_count = Message.objects.filter(
-            sender=user,
-            receiver=request.user,
-            is_read=False
-        ).count()
-
-    return render(request, "messages/inbox.html", {"users": users})
+    # One indexed query over the viewer's conversation summaries
+    page, next_cursor = paginate_or_404(
+        conversations.inbox(request.user), request,
+        ordering=conversations.INBOX_ORDERING, page_size=conversations.INBOX_PAGE_SIZE,
+    )
+    return render(request, "messages/inbox.html", {
+        "users": conversations.contacts(request.user, page),
+        "next_cursor": next_cursor,
+    })
 
 
 @login_required
 def message_thread(request, user_id):
     receiver = get_object_or_404(User, id=user_id)
-    messages = Message.objects.filter(
-        sender__in=[request.user, receiver],
-        receiver__in=[request.user, receiver]
-    ).order_by("timestamp")
+    # Latest page only; older messages come from message_history_api
+    latest, older_cursor = keyset_page(
+        conversations.thread(request.user, receiver),
+        ordering=conversations.THREAD_ORDERING, page_size=conversations.THREAD_PAGE_SIZE,
+    )
+    messages = latest[::-1]
 
     # Mark all messages from receiver as read
-    Message.objects.filter(sender=receiver, receiver=request.user, is_read=False).update(is_read=True)
+    conversations.mark_read(request.user, receiver)
 
     if request.method == "POST":
         form = MessageForm(request.POST, request.FILES)
@@ -269,23 +331,23 @@ def message_thread(request, user_id):
             message.sender = request.user
             message.receiver = receiver
             message.save()
+            conversations.record_message(message)
             return redirect("message_thread", user_id=receiver.id)
     else:
         form = MessageForm()
 
-    # Get all users for sidebar
-    users = User.objects.exclude(id=request.user.id)
-    for user in users:
-        user.unread_count = Message.objects.filter(
-            sender=user,
-            receiver=request.user,
-            is_read=False
-        ).count()
+    # Conversations for sidebar
+    page, next_cursor = paginate_or_404(
+        conversations.inbox(request.user), request,
+        ordering=conversations.INBOX_ORDERING, page_size=conversations.INBOX_PAGE_SIZE,
+    )
 
     return render(request, "messages/inbox.html", {
-        "users": users,
+        "users": conversations.contacts(request.user, page),
+        "next_cursor": next_cursor,
         "receiver": receiver,
         "messages": messages,
+        "older_cursor": older_cursor,
         "form": form,
     })
 
@@ -315,55 +377,164 @@ def send_message(request, user_id):
         image = request.FILES.get("image")
 
         if content or image:
-            Message.objects.create(
+            message = Message.objects.create(
                 sender=request.user,
                 receiver=receiver,
                 content=content,
                 image=image
             )
+            conversations.record_message(message)
 
             # ✅ If AJAX → return JSON
             if request.headers.get("x-requested-with") == "XMLHttpRequest":
                 return JsonResponse({"success": True})
 
             # ✅ Otherwise redirect to receiver's profile
-            return redirect("profile", username=receiver.username)
+            return redirect("view_profile", username=receiver.username)
 
     # Handle GET or invalid POST
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
         return JsonResponse({"success": False})
-    return redirect("profile", username=receiver.username)
+    return redirect("view_profile", username=receiver.username)
 
 @login_required
-def unread_count(request):
-    # Count all unread messages for current user
-    count = Message.objects.filter(receiver=request.user, is_read=False).count()
-    return JsonResponse({"unread_count": count})
+def message_image_variant(request, message_id, width, fmt):
+    """A resized copy of a message image, rendered on first request and kept on disk."""
+    message = get_object_or_404(Message, Q(sender=request.user) | Q(receiver=request.user), id=message_id)
+    if not message.image or width not in thumbnails.WIDTHS or fmt not in thumbnails.FORMATS:
+        raise Http404("No such image variant")
+    name = thumbnails.render_variant(message.image.name, width, fmt)
+    response = FileResponse(default_storage.open(name, "rb"), content_type=f"image/{fmt}")
+    # the name is derived from the message id, and message images never change
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
+
+async def message_stream(request):
+    """Server-Sent Events feed of the viewer's new messages and unread count.
+
+    Needs the ASGI entrypoint (network.asgi): the response stays open and
+    waits on the realtime broker instead of the client polling. Under WSGI
+    the stream could never be sent, so the answer is a 204, which tells
+    EventSource to stop and the page to fall back to long-polling.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    # auser() opened a connection on this request's thread; don't hold it
+    # for the life of the stream (close_all looks the thread's connections
+    # up when it runs, i.e. on that thread)
+    await sync_to_async(connections.close_all)()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+
+    async def events():
+        subscription = realtime.get_broker().subscribe(user.id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await subscription.get(timeout=STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:  # not the builtin TimeoutError before 3.11
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let a proxy buffer the stream
+    return response
+
+
+@login_required
+async def unread_count(request):
+    """Unread message count, with ETag revalidation and optional long-polling.
+
+    A client that sends back the last ETag gets a bodyless 304 while the
+    count is unchanged. With ``?wait=<seconds>`` the request is held until
+    the count changes or the wait expires, so idle tabs poll rarely.
+    """
+    user = await request.auser()
+    wait = min(_int_param(request, "wait"), UNREAD_MAX_WAIT)
+    known = parse_etags(request.headers.get("If-None-Match", ""))
+
+    subscription = realtime.get_broker().subscribe(user.id) if wait else None
+    try:
+        count = await sync_to_async(unread.get_count)(user.id)
+        deadline = time.monotonic() + wait
+        while _unread_etag(count) in known and time.monotonic() < deadline:
+            try:
+                # also re-check the shared counter now and then, in case the
+                # change was published by another process
+                await subscription.get(timeout=min(UNREAD_RECHECK, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+            count = await sync_to_async(unread.get_count)(user.id)
+    finally:
+        if subscription is not None:
+            subscription.close()
+
+    etag = _unread_etag(count)
+    if etag in known:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse({"unread_count": count})
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _unread_etag(count):
+    return quote_etag(f"unread-{count}")
+
+
+def _int_param(request, name):
+    try:
+        return max(int(request.GET.get(name, 0)), 0)
+    except ValueError:
+        return 0
 
 # ---------------------------
 # Explore View
 # ---------------------------
+EXPLORE_PAGE_SIZE = 24
+SEARCH_RESULTS_LIMIT = 50
+
 @login_required
 def explore(request):
     query = request.GET.get("q", "")
+    next_cursor = None
 
     if query:
-        users = User.objects.filter(username__icontains=query).exclude(id=request.user.id)
+        users = [
+            profile.user for profile in search.search_profiles(query, limit=SEARCH_RESULTS_LIMIT + 1)
+            if profile.user_id != request.user.id
+        ][:SEARCH_RESULTS_LIMIT]
         posts = []
     else:
         users = []
-        posts = list(Post.objects.exclude(user=request.user))
-        random.shuffle(posts)
+        # Draw a page from the precomputed candidate pool instead of
+        # loading and shuffling every post
+        try:
+            posts, next_cursor = explore_pool.sample_page(
+                request.user, request.GET.get("cursor"), page_size=EXPLORE_PAGE_SIZE,
+            )
+        except ValueError:
+            raise Http404("Invalid cursor")
+        FeedAssembler(request.user, comment_limit=0).assemble(posts)
 
     return render(request, "explore.html", {
         "users": users,
         "posts": posts,
         "query": query,
+        "next_cursor": next_cursor,
     })
 
 # ---------------------------
 # View Profile
 # ---------------------------
+PROFILE_PAGE_SIZE = 24
 
 @login_required
 def profile(request, username=None):
@@ -373,15 +544,21 @@ def profile(request, username=None):
         user = request.user
 
     profile = get_object_or_404(Profile, user=user)
-    posts = Post.objects.filter(user=user).order_by("-created_at")
+    posts, next_cursor = paginate_or_404(
+        Post.objects.filter(user=user), request, page_size=PROFILE_PAGE_SIZE,
+    )
+    FeedAssembler(request.user, comment_limit=0).assemble(posts)
     is_owner = (user == request.user)
-    followers_count = profile.followers.count()
-    following_count = profile.following.count()
+    followers_count = profile.followers_count
+    following_count = profile.following_count
+    is_following = not is_owner and follows.is_following(request.user.profile, profile)
 
     return render(request, "profile.html", {
         "profile": profile,
         "posts": posts,
+        "next_cursor": next_cursor,
         "is_owner": is_owner,
+        "is_following": is_following,
         "followers_count": followers_count,
         "following_count": following_count,
     })
@@ -393,8 +570,8 @@ def profile(request, username=None):
 # 🔹 Follow/Unfollow (AJAX and non-AJAX)
 @login_required
 def toggle_follow(request, username):
-    target_user = get_object_or_404(User, username=username)
-    target_profile = get_object_or_404(Profile, user=target_user)
+    target_profile = get_object_or_404(Profile.objects.select_related("user"), user__username=username)
+    target_user = target_profile.user
     current_profile = request.user.profile
 
     if target_profile == current_profile:
@@ -403,22 +580,18 @@ def toggle_follow(request, username):
         messages.error(request, "You cannot follow yourself.")
         return redirect("view_profile", username=username)
 
-    is_following = current_profile.following.filter(id=target_profile.id).exists()
-
-    if is_following:
-        current_profile.following.remove(target_profile)
-        target_profile.followers.remove(current_profile)
+    # A DELETE that removes nothing means we weren't following yet
+    if follows.unfollow(current_profile, target_profile):
         action = 'unfollowed'
         if not request.headers.get('x-requested-with') == 'XMLHttpRequest':
             messages.success(request, f"You unfollowed {target_user.username}")
     else:
-        current_profile.following.add(target_profile)
-        target_profile.followers.add(current_profile)
+        follows.follow(current_profile, target_profile)
         action = 'followed'
         if not request.headers.get('x-requested-with') == 'XMLHttpRequest':
             messages.success(request, f"You followed {target_user.username}")
 
-    followers_count = target_profile.followers.count()
+    followers_count, _ = follows.counts(target_profile)[target_profile.id]
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({
@@ -432,18 +605,35 @@ def toggle_follow(request, username):
 @login_required
 def toggle_like(request, post_id):
     post = get_object_or_404(Post, id=post_id)
+    action = request.POST.get("action")  # "like"/"unlike" to set state, else toggle
+
+    if like_buffer.enabled():
+        liked, like_count = like_buffer.record(post, request.user.id, action)
+        if request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return JsonResponse({"liked": liked, "like_count": like_count})
+        return redirect("feed")
 
-    if request.user in post.likes.all():
-        post.likes.remove(request.user)
+    if action == "like":
+        changed = Post.objects.add_like(post.id, request.user.id)
+        liked = True
+    elif action == "unlike":
+        changed = Post.objects.remove_like(post.id, request.user.id)
         liked = False
     else:
-        post.likes.add(request.user)
-        liked = True
+        # Toggle: a DELETE that removes nothing means the like wasn't there
+        liked = not Post.objects.remove_like(post.id, request.user.id)
+        changed = Post.objects.add_like(post.id, request.user.id) if liked else True
+
+    if changed:
+        counters.bump_post(post, like_count=1 if liked else -1)
+        bump_card_version(post.id)
+        post.refresh_from_db(fields=["like_count", "counter_shards"])
+    counters.with_shards([post])  # a sharded post's count lives partly in shards, even on a no-op retry
 
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
         return JsonResponse({
             "liked": liked,
-            "like_count": post.likes.count(),
+            "like_count": post.like_count,
         })
 
     # 🔥 Normal form submit → redirect to profile
@@ -453,15 +643,166 @@ def toggle_like(request, post_id):
 # ---------------------------
 # API Views
 # ---------------------------
+PROFILE_LIST_PAGE_SIZE = 10
+PROFILE_LIST_CACHE_TTL = getattr(settings, "PROFILE_LIST_CACHE_TTL", 30)
+
+
 @api_view(['GET'])
 def profile_list(request):
-    paginator = PageNumberPagination()
-    paginator.page_size = 10
-    profiles = Profile.objects.all()
-    result_page = paginator.paginate_queryset(profiles, request)
-    serializer = ProfileDetailSerializer(result_page, many=True)
+    """All profiles, 10 per page.
+
+    ``?page=N`` keeps the numbered pages (one COUNT per call); passing
+    ``?cursor=`` (empty for the first page) switches to keyset pages on
+    ``-id``. Either way a page is one query (two with the COUNT), and the
+    rendered page is cached briefly per URL.
+    """
+    cache_key = "profile_list:" + hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    data = cache.get(cache_key)
+    if data is None:
+        if "cursor" in request.query_params:
+            paginator = KeysetPagination(ordering=("-id",), page_size=PROFILE_LIST_PAGE_SIZE)
+        else:
+            paginator = PageNumberPagination()
+            paginator.page_size = PROFILE_LIST_PAGE_SIZE
+        profiles = Profile.objects.select_related("user").order_by("-id")
+        result_page = paginator.paginate_queryset(profiles, request)
+        serializer = ProfileDetailSerializer(result_page, many=True)
+        data = paginator.get_paginated_response(serializer.data).data
+        cache.set(cache_key, data, PROFILE_LIST_CACHE_TTL)
+    return Response(data)
+
+
+@api_view(['GET'])
+def profile_detail_api(request, profile_id):
+    profile = get_object_or_404(Profile.objects.select_related("user"), id=profile_id)
+    return Response(ProfileSerializer(profile, context={"request": request}).data)
+
+
+RELATION_PAGE_SIZE = 50
+
+
+def _relation_page(request, profile_id, relation):
+    """One keyset page of a profile's followers or followees, newest edge first."""
+    get_object_or_404(Profile, id=profile_id)
+    if relation == "followers":
+        edges = follows.FollowEdge.objects.filter(from_profile_id=profile_id).select_related("to_profile__user")
+    else:
+        edges = follows.FollowEdge.objects.filter(to_profile_id=profile_id).select_related("from_profile__user")
+    paginator = KeysetPagination(ordering=("-id",), page_size=RELATION_PAGE_SIZE)
+    page = paginator.paginate_queryset(edges, request)
+    profiles = [edge.to_profile if relation == "followers" else edge.from_profile for edge in page]
+    return paginator.get_paginated_response(ProfileRowSerializer(profiles, many=True).data)
+
+
+@api_view(['GET'])
+def profile_followers_api(request, profile_id):
+    return _relation_page(request, profile_id, "followers")
+
+
+@api_view(['GET'])
+def profile_following_api(request, profile_id):
+    return _relation_page(request, profile_id, "following")
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def feed_api(request):
+    """Next page of the viewer's feed as compact JSON, for infinite scroll."""
+    paginator = KeysetPagination(ordering=timeline.TIMELINE_ORDERING, page_size=timeline.FEED_PAGE_SIZE)
+    entries = paginator.paginate_queryset(timeline.home_timeline(request.user), request)
+    posts = FeedAssembler(request.user, comment_limit=0).assemble(entry.post for entry in entries)
+    serializer = PostSerializer(posts, many=True)
     return paginator.get_paginated_response(serializer.data)
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def post_comments_api(request, post_id):
+    """A post's comments, oldest first, for "load more comments"."""
+    get_object_or_404(Post, id=post_id)
+    paginator = KeysetPagination(ordering=COMMENT_ORDERING, page_size=COMMENT_PAGE_SIZE)
+    page = paginator.paginate_queryset(post_comments(post_id), request)
+    return paginator.get_paginated_response(CommentSerializer(page, many=True).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def message_history_api(request, user_id):
+    """Older messages of a thread, newest first, for "load older"."""
+    other = get_object_or_404(User, id=user_id)
+    paginator = KeysetPagination(ordering=conversations.THREAD_ORDERING, page_size=conversations.THREAD_PAGE_SIZE)
+    page = paginator.paginate_queryset(conversations.thread(request.user, other), request)
+    return paginator.get_paginated_response(MessageSerializer(page, many=True).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_follow_api(request):
+    """Follow or unfollow many profiles at once.
+
+    Body: ``{"action": "follow" | "unfollow", "profile_ids": [...]}``
+    (at most ``follows.BULK_LIMIT`` ids).
+    """
+    if not isinstance(request.data, dict):
+        return Response({"error": "Expected a JSON object"}, status=400)
+    action = request.data.get("action")
+    profile_ids = request.data.get("profile_ids")
+    if action not in ("follow", "unfollow") or not isinstance(profile_ids, list):
+        return Response({"error": "Expected action follow/unfollow and a list of profile_ids"}, status=400)
+    if len(profile_ids) > follows.BULK_LIMIT:
+        return Response({"error": f"At most {follows.BULK_LIMIT} profiles per request"}, status=400)
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in profile_ids):
+        return Response({"error": "profile_ids must be integers"}, status=400)
+
+    current_profile = request.user.profile
+    targets = Profile.objects.filter(id__in=profile_ids)
+    if action == "follow":
+        changed = follows.bulk_follow(current_profile, targets)
+    else:
+        changed = follows.bulk_unfollow(current_profile, targets)
+
+    counts = follows.counts(current_profile, *changed)
+    return Response({
+        "action": action,
+        "changed": [profile.id for profile in changed],
+        "following_count": counts[current_profile.id][1],
+        "followers_counts": {profile.id: counts[profile.id][0] for profile in changed},
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def follow_suggestions_api(request):
+    """People you may know, from the last ``compute_suggestions`` run."""
+    return Response({"results": [
+        {
+            "id": profile.id,
+            "username": profile.user.username,
+            "avatar": profile.avatar.url if profile.avatar else None,
+            "mutual_count": profile.mutual_count,
+        }
+        for profile in suggestions.for_profile(request.user.profile)
+    ]})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_autocomplete(request):
+    """Ranked username prefix matches for the search box."""
+    return Response({"results": search.autocomplete(request.query_params.get("q", ""))})
+
+# ---------------------------
+# Metrics
+# ---------------------------
+def prometheus_metrics(request):
+    """Prometheus scrape target for instafinsta.metrics; 404 unless METRICS_ENABLED."""
+    if not metrics.enabled():
+        raise Http404()
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ---------------------------
 # Home View
 # ---------------------------
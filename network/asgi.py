@@ -3,6 +3,11 @@ ASGI config for network project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve through this entrypoint (not network.wsgi) in production: the
+message stream (instafinsta.views.message_stream) keeps Server-Sent Events
+connections open, which only an ASGI server can do without pinning a
+worker per client.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
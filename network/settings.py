@@ -61,8 +61,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'instafinsta.metrics.MetricsMiddleware',
 ]
 
+# Per-view latency/SQL histograms at /metrics (Prometheus); off unless set.
+# With METRICS_TOKEN set, scrapers must send "Authorization: Bearer <token>".
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 ROOT_URLCONF = 'instafinsta.urls'
 
 TEMPLATES = [
@@ -106,6 +112,30 @@ DATABASES = {
 }
 
 
+# Cache
+# Per-process memory by default; set REDIS_URL to share one cache between
+# workers (unread counts, explore pool, post card fragments, ...). Anything
+# that runs out of process -- process_uploads, reconcile_counters, a
+# separate upload worker -- needs REDIS_URL too, or its post card
+# invalidations never reach the web workers.
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'instafinsta',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 